@@ -0,0 +1,244 @@
+########################################################################
+#                                                                      #
+#   BatchSolveKenKen.py                                                #
+#       Created: Jan 27, 2013                                          #
+#                                                                      #
+#       A module for solving many ken ken problems at once across a    #
+#       pool of worker processes                                       #
+#                                                                      #
+########################################################################
+
+import sys
+import time
+import cPickle
+import argparse
+import threading
+import multiprocessing
+
+import SolveKenKen as SKK
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Puzzles handed to a worker at a time
+CHUNK_SIZE = 8
+
+#   How many chunks per worker may be read off of the input and not yet
+#   handed back.  The pool would otherwise read the entire input up
+#   front
+CHUNKS_IN_FLIGHT = 4
+
+
+# ==================================================================== #
+#   Batch solving                                                      #
+# ==================================================================== #
+
+def solveBatch( puzzles, workers = None, chunkSize = CHUNK_SIZE, timeLimit = None,
+                ordered = True, useSearch = True, statistics = None ):
+    """
+    Solve every kenken in puzzles (an iterable of kenken objects, or the
+    name of a file written by writePuzzleFile) and yield
+
+        ( index, SolveResult )
+
+    pairs, in input order if ordered is True and as they finish
+    otherwise.  workers defaults to the number of cores; with a single
+    worker everything happens in this process.  timeLimit (seconds)
+    applies to each puzzle.  If given a BatchStatistics, it is updated
+    as results come in
+    """
+    if isinstance( puzzles, basestring ):
+        puzzles = readPuzzleFile( puzzles )
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    if statistics is None:
+        statistics = BatchStatistics()
+    statistics.start()
+
+    jobs = ( ( index, k, useSearch, timeLimit ) for ( index, k ) in enumerate( puzzles ) )
+
+    if workers == 1:
+        for job in jobs:
+            index, result = solveJob( job )
+            statistics.add( result )
+            yield index, result
+
+    else:
+        pool = multiprocessing.Pool( workers )
+        window = workers * chunkSize * CHUNKS_IN_FLIGHT
+        slots = threading.Semaphore( window )
+        try:
+            if ordered:
+                results = pool.imap( solveJob, boundedJobs( jobs, slots ), chunkSize )
+            else:
+                results = pool.imap_unordered( solveJob, boundedJobs( jobs, slots ), chunkSize )
+            
+            for ( index, result ) in results:
+                slots.release()
+                statistics.add( result )
+                yield index, result
+            
+            pool.close()
+        
+        except:
+            #   (let the pool's feeder thread past boundedJobs, so that
+            #   terminate can stop it)
+            for i in range( window ):
+                slots.release()
+            pool.terminate()
+            raise
+
+        finally:
+            pool.join()
+
+    statistics.stop()
+
+
+def boundedJobs( jobs, slots ):
+    """
+    Yield the jobs, taking one of slots (a threading.Semaphore) for
+    each.  The pool reads its input from a thread of its own, so this
+    only holds that thread back once the window is full; whoever reads
+    the results gives a slot back for each, and the window slides on
+    one puzzle at a time rather than waiting for a whole window to be
+    done
+    """
+    for job in jobs:
+        slots.acquire()
+        yield job
+
+
+def solveJob( job ):
+    """
+    Solve one ( index, kenken, useSearch, timeLimit ) job.  This runs in
+    the worker processes, so it has to live at the module level
+    """
+    index, k, useSearch, timeLimit = job
+    return index, SKK.solve( k, useSearch = useSearch, timeLimit = timeLimit )
+
+
+class BatchStatistics():
+    """
+    Running totals for a batch:  puzzle count, counts by status, time
+    spent solving (summed over workers), and wall time
+    """
+
+    def __init__( self ):
+        self.count = 0
+        self.statusCounts = dict( ( status, 0 ) for status in [ SKK.SOLVED, SKK.UNSOLVED, SKK.CONTRADICTION, SKK.TIMEOUT ] )
+        self.solveTime = 0.
+        self.startTime = None
+        self.stopTime = None
+
+
+    def start( self ):
+        self.startTime = time.time()
+        self.stopTime = None
+
+
+    def stop( self ):
+        self.stopTime = time.time()
+
+
+    def add( self, result ):
+        self.count += 1
+        self.statusCounts[ result.status ] += 1
+        self.solveTime += result.wallTime
+
+
+    def wallTime( self ):
+        if self.startTime is None:
+            return 0.
+        if self.stopTime is None:
+            return time.time() - self.startTime
+        return self.stopTime - self.startTime
+
+
+    def throughput( self ):
+        """
+        Puzzles per second of wall time
+        """
+        wallTime = self.wallTime()
+        if wallTime == 0:
+            return 0.
+        return self.count / wallTime
+
+
+    def asDict( self ):
+        return { 'count'        : self.count,
+                 'statusCounts' : dict( self.statusCounts ),
+                 'solveTime'    : self.solveTime,
+                 'wallTime'     : self.wallTime(),
+                 'throughput'   : self.throughput() }
+
+
+    def report( self ):
+        """
+        One line summary
+        """
+        statuses = ', '.join( '%s %d' % ( status, n ) for ( status, n ) in sorted( self.statusCounts.iteritems() ) if n )
+        return '%d puzzles in %.2fs (%.1f / s; %.2fs solving) -- %s' % \
+               ( self.count, self.wallTime(), self.throughput(), self.solveTime, statuses )
+
+
+# ==================================================================== #
+#   Puzzle files                                                       #
+# ==================================================================== #
+
+def writePuzzleFile( fileName, puzzles ):
+    """
+    Pickle the kenken objects in puzzles one after another into fileName
+    """
+    f = open( fileName, 'wb' )
+    try:
+        for k in puzzles:
+            cPickle.dump( k, f, cPickle.HIGHEST_PROTOCOL )
+    finally:
+        f.close()
+
+
+def readPuzzleFile( fileName ):
+    """
+    Yield the kenken objects stored in fileName by writePuzzleFile
+    """
+    f = open( fileName, 'rb' )
+    try:
+        while True:
+            try:
+                yield cPickle.load( f )
+            except EOFError:
+                break
+    finally:
+        f.close()
+
+
+# ==================================================================== #
+#   Command line                                                       #
+# ==================================================================== #
+
+def main( argv = None ):
+    parser = argparse.ArgumentParser( description = 'Solve a file of kenken puzzles in parallel' )
+    parser.add_argument( 'puzzleFile' )
+    parser.add_argument( '-w', '--workers', type = int, default = None )
+    parser.add_argument( '-c', '--chunk-size', type = int, default = CHUNK_SIZE )
+    parser.add_argument( '-t', '--time-limit', type = float, default = None )
+    parser.add_argument( '-u', '--unordered', action = 'store_true' )
+    parser.add_argument( '-q', '--quiet', action = 'store_true' )
+    args = parser.parse_args( argv )
+
+    statistics = BatchStatistics()
+    for ( index, result ) in solveBatch( args.puzzleFile, workers = args.workers,
+                                         chunkSize = args.chunk_size, timeLimit = args.time_limit,
+                                         ordered = not args.unordered, statistics = statistics ):
+        if not args.quiet:
+            print index, result
+
+    print >> sys.stderr, statistics.report()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+########################################################################
+#                                                                      #
+#   BenchmarkKenKen.py                                                 #
+#       Created: Feb 2, 2013                                           #
+#                                                                      #
+#       A reproducible benchmark of ken ken generation and solving     #
+#                                                                      #
+########################################################################
+
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import platform
+
+import scipy
+
+import LatinSquare as LS
+import KenKenCage as KKC
+import KenKenClass as K
+import SolveKenKen as SKK
+import ExactCoverKenKen as XKK
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+SIZES = range( 4, 10 )
+COUNT = 10
+SEED = 2013
+TIME_LIMIT = 60.
+
+#   Cage length mixes:  ( cumulative probability, length ) pairs as
+#   used by KenKenCage ('default' is KenKenCage.DEFAULT_LENGTHS as it
+#   was when the corpus was frozen)
+MIXES = {
+    'small'   : [ ( .05, 1 ), ( .75, 2 ), ( 1., 3 ) ],
+    'default' : [ ( .03, 1 ), ( .388125, 2 ), ( .865625, 3 ), ( .985, 4 ), ( .995, 5 ), ( 1., 6 ) ],
+    'large'   : [ ( .02, 1 ), ( .15, 2 ), ( .45, 3 ), ( .75, 4 ), ( .92, 5 ), ( 1., 6 ) ],
+}
+
+#   md5 of the corpus for SEED, SIZES, every mix, and COUNT puzzles (see
+#   corpusChecksum).  If this no longer matches, the corpus has changed
+#   and timings can't be compared with earlier reports
+CORPUS_CHECKSUM = '7602bb537dbb6e9dfa15cdd96acec198'
+
+#   Stages we time separately
+LATIN_SQUARE = 'latinSquare'
+CAGES = 'cages'
+RULES = 'rules'
+SOLVE = 'solve'
+STAGES = [ LATIN_SQUARE, CAGES, RULES, SOLVE ]
+
+PERCENTILES = [ 50, 90, 99 ]
+
+#   Solving engines:  name : solve( k, timeLimit = ... ) -> SolveResult
+ENGINES = {
+    'propagate' : SKK.solve,
+    'dlx'       : XKK.solve,
+}
+DEFAULT_ENGINE = 'propagate'
+
+
+# ==================================================================== #
+#   Corpus                                                             #
+# ==================================================================== #
+
+def puzzleSeed( seed, N, mix, index ):
+    """
+    A seed for one puzzle of the corpus, so that every puzzle can be
+    rebuilt on its own
+    """
+    return ( ( seed * 100 + N ) * 1000 + sorted( MIXES ).index( mix ) ) * 100000 + index
+
+
+def corpusLatinSquare( N, rng ):
+    """
+    The solution grids of the corpus are shuffled cyclic squares built
+    here, so that the corpus doesn't change along with LatinSquare
+    """
+    rows = range( N )
+    columns = range( N )
+    symbols = range( 1, N + 1 )
+    rng.shuffle( rows )
+    rng.shuffle( columns )
+    rng.shuffle( symbols )
+
+    return scipy.array( [ [ symbols[ ( rows[ i ] + columns[ j ] ) % N ] for j in range( N ) ]
+                          for i in range( N ) ] )
+
+
+def corpusCages( N, lengthDistribution, rng ):
+    """
+    The cages of the corpus, also built here rather than by KenKenCage:
+    take the nodes in a random order, and grow a cage of a random length
+    from each one not yet in a cage, one random free neighbour at a time
+    (stopping short if there are none left)
+    """
+    nodes = [ ( i, j ) for i in range( N ) for j in range( N ) ]
+    rng.shuffle( nodes )
+    
+    taken = set()
+    cages = []
+    for node in nodes:
+        if node in taken:
+            continue
+        
+        r = rng.random()
+        length = [ l for ( probability, l ) in lengthDistribution if r < probability ][0]
+        
+        cage = [ node ]
+        taken.add( node )
+        while len( cage ) < length:
+            free = sorted( set( ( a, b ) for ( i, j ) in cage \
+                                for ( a, b ) in ( ( i - 1, j ), ( i + 1, j ), ( i, j - 1 ), ( i, j + 1 ) ) \
+                                if 0 <= a < N and 0 <= b < N and ( a, b ) not in taken ) )
+            if free == []:
+                break
+            neighbor = rng.choice( free )
+            cage.append( neighbor )
+            taken.add( neighbor )
+        
+        cages.append( sorted( cage ) )
+    
+    return cages
+
+
+def corpusRule( cage, solution, rng ):
+    """
+    A random rule for one cage of the corpus, drawn the way
+    KenKenClass.randomRule draws them (but kept here, for the same
+    reason as corpusLatinSquare)
+    """
+    values = sorted( int( solution[ node ] ) for node in cage )
+    
+    if len( cage ) == 1:
+        return ( cage, K.EQUALS, values[0] )
+    
+    if len( cage ) == 2:
+        operation = rng.choice( [ K.PLUS, K.MINUS, K.TIMES, K.DIVIDE ] )
+        if operation == K.DIVIDE and values[1] % values[0] != 0:
+            operation = K.MINUS
+    else:
+        operation = rng.choice( [ K.PLUS, K.TIMES ] )
+    
+    if operation == K.PLUS:
+        value = sum( values )
+    elif operation == K.TIMES:
+        value = reduce( lambda a, b : a * b, values, 1 )
+    elif operation == K.MINUS:
+        value = values[1] - values[0]
+    else:#operation == K.DIVIDE:
+        value = values[1] / values[0]
+    
+    return ( cage, operation, value )
+
+
+def corpusKenKen( N, mix, index, seed = SEED ):
+    """
+    Build puzzle number index of the ( N, mix ) part of the corpus.
+    Everything is drawn from a random.Random of its own and built by
+    the corpus functions above, so the corpus only depends on the seed
+    (see corpusChecksum)
+    """
+    rng = random.Random( puzzleSeed( seed, N, mix, index ) )
+    solution = corpusLatinSquare( N, rng )
+    cages = corpusCages( N, MIXES[ mix ], rng )
+    ruleList = [ corpusRule( cage, solution, rng ) for cage in cages ]
+    
+    return K.KenKen( N, solution, ruleList = ruleList )
+
+
+def corpusChecksum( seed = SEED, sizes = SIZES, mixes = None, count = COUNT ):
+    """
+    md5 (hex) of the rules and solutions of the corpus
+    """
+    if mixes is None:
+        mixes = sorted( MIXES )
+    
+    md5 = hashlib.md5()
+    for N in sizes:
+        for mix in mixes:
+            for index in range( count ):
+                k = corpusKenKen( N, mix, index, seed )
+                md5.update( repr( ( N, mix, index, k.ruleList, k.solution.tolist() ) ) )
+    
+    return md5.hexdigest()
+
+
+def checkCorpus():
+    """
+    Make sure the default corpus is the one CORPUS_CHECKSUM was taken of
+    """
+    checksum = corpusChecksum()
+    if checksum != CORPUS_CHECKSUM:
+        raise RuntimeError, "The benchmark corpus has changed (checksum %s, expected %s)" % ( checksum, CORPUS_CHECKSUM )
+
+
+def timeGeneration( N, mix, index, seed, timings ):
+    """
+    Time the live latin square, cage, and rule generators on a puzzle
+    of their own (drawn from a random.Random seeded like puzzle index
+    of the corpus), adding the times to timings (stage : list of times).
+    The rules stage is KenKen.createRules, lookups included, on a
+    KenKen made without rules beforehand
+    """
+    rng = random.Random( puzzleSeed( seed, N, mix, index ) )
+    
+    startTime = time.time()
+    solution = LS.randomLatinSquare( N, rng )
+    timings[ LATIN_SQUARE ].append( time.time() - startTime )
+    
+    startTime = time.time()
+    cages = KKC.KenKenCage( N, MIXES[ mix ], rng ).getCageList()
+    timings[ CAGES ].append( time.time() - startTime )
+    
+    k = K.KenKen( N, solution, rng, ruleList = [] )
+    startTime = time.time()
+    k.createRules( cages )
+    timings[ RULES ].append( time.time() - startTime )
+
+
+# ==================================================================== #
+#   Benchmark                                                          #
+# ==================================================================== #
+
+def runBenchmark( sizes = SIZES, mixes = None, count = COUNT, seed = SEED, timeLimit = TIME_LIMIT,
+                  engine = DEFAULT_ENGINE ):
+    """
+    Time every stage for count puzzles of every size and mix, solving
+    the corpus with the given engine (see ENGINES), and return a report
+    dictionary (see summarize).  The generation stages time the live
+    generators (see timeGeneration), so they follow the code; what is
+    solved is the frozen corpus, checked first if seed is SEED
+    """
+    if mixes is None:
+        mixes = sorted( MIXES )
+    
+    if seed == SEED:
+        checkCorpus()
+
+    results = {}
+    statuses = {}
+    for N in sizes:
+        for mix in mixes:
+            timings = dict( ( stage, [] ) for stage in STAGES )
+            statusCounts = {}
+
+            for index in range( count ):
+                timeGeneration( N, mix, index, seed, timings )
+                k = corpusKenKen( N, mix, index, seed )
+
+                result = ENGINES[ engine ]( k, timeLimit = timeLimit )
+                timings[ SOLVE ].append( result.wallTime )
+                statusCounts[ result.status ] = statusCounts.get( result.status, 0 ) + 1
+
+            key = '%dx%d/%s' % ( N, N, mix )
+            results[ key ] = dict( ( stage, summarize( times ) ) for ( stage, times ) in timings.iteritems() )
+            statuses[ key ] = statusCounts
+
+    return { 'meta'     : { 'seed'      : seed,
+                            'corpus'    : corpusChecksum( seed, sizes, mixes, count ),
+                            'count'     : count,
+                            'sizes'     : list( sizes ),
+                            'mixes'     : list( mixes ),
+                            'timeLimit' : timeLimit,
+                            'engine'    : engine,
+                            'python'    : platform.python_version(),
+                            'machine'   : platform.machine() },
+             'results'  : results,
+             'statuses' : statuses }
+
+
+def summarize( times ):
+    """
+    Percentiles, mean, total, and throughput of a list of times
+    """
+    times = sorted( times )
+    n = len( times )
+    total = sum( times )
+
+    summary = { 'count' : n,
+                'total' : total,
+                'mean'  : total / n if n else 0.,
+                'throughput' : n / total if total > 0 else None }
+    for p in PERCENTILES:
+        summary[ 'p%d' % p ] = percentile( times, p )
+
+    return summary
+
+
+def percentile( sortedTimes, p ):
+    """
+    Nearest rank percentile of an already sorted list
+    """
+    if sortedTimes == []:
+        return 0.
+    rank = int( scipy.ceil( p / 100. * len( sortedTimes ) ) )
+    return sortedTimes[ max( rank, 1 ) - 1 ]
+
+
+def compareReports( oldReport, newReport, stat = 'p50' ):
+    """
+    Return a list of ( key, stage, old, new, new / old ) rows for every
+    key and stage the two reports have in common
+    """
+    rows = []
+    for key in sorted( newReport[ 'results' ] ):
+        if key not in oldReport[ 'results' ]:
+            continue
+        for stage in STAGES:
+            old = oldReport[ 'results' ][ key ][ stage ][ stat ]
+            new = newReport[ 'results' ][ key ][ stage ][ stat ]
+            ratio = new / old if old else None
+            rows.append( ( key, stage, old, new, ratio ) )
+
+    return rows
+
+
+# ==================================================================== #
+#   Command line                                                       #
+# ==================================================================== #
+
+def main( argv = None ):
+    parser = argparse.ArgumentParser( description = 'Benchmark kenken generation and solving' )
+    parser.add_argument( '-n', '--sizes', type = int, nargs = '+', default = SIZES )
+    parser.add_argument( '-m', '--mixes', nargs = '+', choices = sorted( MIXES ), default = None )
+    parser.add_argument( '-c', '--count', type = int, default = COUNT )
+    parser.add_argument( '-s', '--seed', type = int, default = SEED )
+    parser.add_argument( '-t', '--time-limit', type = float, default = TIME_LIMIT )
+    parser.add_argument( '-e', '--engine', choices = sorted( ENGINES ), default = DEFAULT_ENGINE )
+    parser.add_argument( '-o', '--output', default = None, help = 'write the json report here' )
+    parser.add_argument( '--compare', default = None, help = 'an earlier json report to compare against' )
+    args = parser.parse_args( argv )
+
+    report = runBenchmark( args.sizes, args.mixes, args.count, args.seed, args.time_limit, args.engine )
+
+    text = json.dumps( report, indent = 2, sort_keys = True )
+    if args.output is None:
+        print text
+    else:
+        f = open( args.output, 'w' )
+        try:
+            f.write( text + '\n' )
+        finally:
+            f.close()
+
+    for ( key, stage, results ) in ( ( key, stage, report[ 'results' ][ key ][ stage ] )
+                                     for key in sorted( report[ 'results' ] ) for stage in STAGES ):
+        print >> sys.stderr, '%-14s %-12s p50 %9.5fs  p90 %9.5fs  p99 %9.5fs' % \
+              ( key, stage, results[ 'p50' ], results[ 'p90' ], results[ 'p99' ] )
+
+    if args.compare is not None:
+        f = open( args.compare )
+        try:
+            oldReport = json.load( f )
+        finally:
+            f.close()
+
+        print >> sys.stderr, '\nnew / old (p50):'
+        for ( key, stage, old, new, ratio ) in compareReports( oldReport, report ):
+            if ratio is not None:
+                print >> sys.stderr, '%-14s %-12s %6.2f' % ( key, stage, ratio )
+
+
+if __name__ == '__main__':
+    main()
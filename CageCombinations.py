@@ -0,0 +1,208 @@
+########################################################################
+#                                                                      #
+#   CageCombinations.py                                                #
+#       Created: Jan 20, 2013                                          #
+#                                                                      #
+#       A process-wide table of the value combinations which satisfy   #
+#       a ken ken rule                                                 #
+#                                                                      #
+########################################################################
+
+import cPickle
+import itertools
+import collections
+
+import numpy
+
+from KenKenClass import EQUALS, PLUS, TIMES, MINUS, DIVIDE
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   The table is built lazily one ( operation, length, N ) group at a
+#   time -- a single pass over the candidate multisets fills in every
+#   target value for that group.  Only the most recently used groups
+#   are kept around
+MAX_GROUPS = 64
+
+#   Distinct orderings of the multisets, cleared wholesale when full
+MAX_ORDERINGS = 100000
+
+#   Every ordering of every multiset for one rule, as an array, cleared
+#   wholesale when full
+MAX_ARRAYS = 4096
+
+#   Values are at most N, so the ordering arrays hold small ints
+TUPLE_TYPE = numpy.uint8
+
+_groupDic = collections.OrderedDict()
+_orderingDic = {}
+_arrayDic = {}
+
+
+# ==================================================================== #
+#   Lookups                                                            #
+# ==================================================================== #
+
+def valueCombinations( operation, value, l, N ):
+    """
+    Return a tuple of the sorted multisets of l values from 1 - N which
+    satisfy the rule ( operation, value )
+    """
+    return combinationGroup( operation, l, N ).get( value, () )
+
+
+def valueOrderings( combination ):
+    """
+    Return a tuple of the distinct orderings of the values in
+    combination (permutations without the repeats)
+    """
+    try:
+        return _orderingDic[ combination ]
+
+    except KeyError:
+        if len( _orderingDic ) >= MAX_ORDERINGS:
+            _orderingDic.clear()
+
+        orderings = tuple( sorted( set( itertools.permutations( combination ) ) ) )
+        _orderingDic[ combination ] = orderings
+        return orderings
+
+
+def orderingArray( operation, value, l, N, check = None ):
+    """
+    Return every distinct ordering of every multiset satisfying the rule
+    ( operation, value ), as a read only ( orderings x l ) array of
+    TUPLE_TYPE.  Building one for a big cage can take a while; check,
+    if given, is called before each multiset is expanded (and may raise
+    to give up, leaving nothing cached)
+    """
+    key = ( operation, value, l, N )
+    
+    try:
+        return _arrayDic[ key ]
+    
+    except KeyError:
+        if len( _arrayDic ) >= MAX_ARRAYS:
+            _arrayDic.clear()
+        
+        orderings = []
+        for combination in valueCombinations( operation, value, l, N ):
+            if check is not None:
+                check()
+            orderings.extend( valueOrderings( combination ) )
+        
+        a = numpy.array( orderings, dtype = TUPLE_TYPE ).reshape( -1, l )
+        a.flags.writeable = False
+        _arrayDic[ key ] = a
+        return a
+
+
+def combinationGroup( operation, l, N ):
+    """
+    Return the dictionary of value : ( combination, ... ) pairs for
+    every value reachable by operation on l values from 1 - N, building
+    it if it isn't in the table already
+    """
+    key = ( operation, l, N )
+
+    try:
+        group = _groupDic.pop( key )
+
+    except KeyError:
+        group = buildGroup( operation, l, N )
+        if len( _groupDic ) >= MAX_GROUPS:
+            _groupDic.popitem( last = False )
+
+    #   (Re-)insert as the most recently used
+    _groupDic[ key ] = group
+    return group
+
+
+def buildGroup( operation, l, N ):
+    """
+    Cycle through every candidate multiset once, filing each under the
+    value it produces
+    """
+    values = range( 1, N + 1 )
+
+    if operation == EQUALS:
+        raise ValueError, "Equals rule that wasn't removed"
+
+    elif operation == PLUS:
+        x = itertools.combinations_with_replacement( values, l )
+        result = sum
+
+    elif operation == TIMES:
+        x = itertools.combinations_with_replacement( values, l )
+        result = lambda el : reduce( lambda a, b : a * b, el, 1 )
+
+    elif operation == MINUS:
+        x = itertools.combinations( values, 2 )
+        result = lambda el : el[1] - el[0]
+
+    else:#operation == DIVIDE:
+        x = ( el for el in itertools.combinations( values, 2 ) if el[1] % el[0] == 0 )
+        result = lambda el : el[1] / el[0]
+
+    group = {}
+    for el in x:
+        group.setdefault( result( el ), [] ).append( el )
+
+    return dict( ( value, tuple( combos ) ) for (value, combos) in group.iteritems() )
+
+
+# ==================================================================== #
+#   Table management                                                   #
+# ==================================================================== #
+
+def precompute( N, maxLength = 6 ):
+    """
+    Build every group needed for an N x N kenken with rules of up to
+    maxLength nodes
+    """
+    for l in range( 2, maxLength + 1 ):
+        combinationGroup( PLUS, l, N )
+        combinationGroup( TIMES, l, N )
+
+    combinationGroup( MINUS, 2, N )
+    combinationGroup( DIVIDE, 2, N )
+
+
+def clearTable():
+    """
+    Forget everything
+    """
+    _groupDic.clear()
+    _orderingDic.clear()
+    _arrayDic.clear()
+
+
+def saveTable( fileName ):
+    """
+    Write the groups currently in the table to fileName
+    """
+    f = open( fileName, 'wb' )
+    try:
+        cPickle.dump( dict( _groupDic ), f, cPickle.HIGHEST_PROTOCOL )
+    finally:
+        f.close()
+
+
+def loadTable( fileName ):
+    """
+    Add the groups saved in fileName to the table
+    """
+    f = open( fileName, 'rb' )
+    try:
+        groupDic = cPickle.load( f )
+    finally:
+        f.close()
+
+    for ( key, group ) in groupDic.iteritems():
+        _groupDic.pop( key, None )
+        if len( _groupDic ) >= MAX_GROUPS:
+            _groupDic.popitem( last = False )
+        _groupDic[ key ] = group
@@ -0,0 +1,201 @@
+########################################################################
+#                                                                      #
+#   CorpusKenKen.py                                                    #
+#       Created: Feb 10, 2013                                          #
+#                                                                      #
+#       A module for reading and writing memory mapped corpora of      #
+#       ken ken problems                                               #
+#                                                                      #
+########################################################################
+
+import os
+
+import numpy
+
+import EncodeKenKen as E
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Puzzles encoded at a time by CorpusWriter.writePuzzles
+BATCH_SIZE = 1024
+
+
+# ==================================================================== #
+#   Reading                                                            #
+# ==================================================================== #
+
+class CorpusReader():
+    """
+    Random access to a corpus file written by CorpusWriter (or
+    EncodeKenKen.savePuzzles).  The records are memory mapped read only,
+    so nothing is read until it is used, any number of processes can
+    share one file through the page cache, and
+
+        reader[ n ]         record n
+        reader[ a : b ]     records a to b - 1
+
+    are views into the file rather than copies.  Every record has the
+    same width, so the offset of record n is computed in O(1) rather
+    than looked up (see offset)
+    """
+
+    def __init__( self, fileName ):
+        self.fileName = fileName
+
+        f = open( fileName, 'rb' )
+        try:
+            self.dtype, self.count = E.readHeader( f )
+        finally:
+            f.close()
+
+        self.N = self.dtype[ 'cages' ].shape[0]
+
+        #   (mmap can't map nothing)
+        if self.count == 0:
+            self.records = numpy.zeros( 0, dtype = self.dtype )
+        else:
+            self.records = numpy.memmap( fileName, dtype = self.dtype, mode = 'r',
+                                         offset = E.HEADER_SIZE, shape = ( self.count, ) )
+
+
+    def __len__( self ):
+        return self.count
+
+
+    def __getitem__( self, key ):
+        return self.records[ key ]
+
+
+    def offset( self, n ):
+        """
+        The byte offset of record n in the file
+        """
+        if not 0 <= n < self.count:
+            raise IndexError, "No puzzle %d in a corpus of %d" % ( n, self.count )
+        return E.HEADER_SIZE + n * self.dtype.itemsize
+
+
+    def puzzle( self, n ):
+        """
+        Puzzle n as a KenKen object
+        """
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError, "No puzzle %d in a corpus of %d" % ( n, self.count )
+        return E.decodePuzzles( self.records[ n : n + 1 ] )[0]
+
+
+    def puzzles( self, start = 0, stop = None, batchSize = BATCH_SIZE ):
+        """
+        Yield puzzles start to stop - 1 as KenKen objects, decoding
+        batchSize at a time
+        """
+        if stop is None:
+            stop = self.count
+
+        for batchStart in xrange( start, stop, batchSize ):
+            for k in E.decodePuzzles( self.records[ batchStart : min( batchStart + batchSize, stop ) ] ):
+                yield k
+
+
+    def close( self ):
+        """
+        Let go of the memory map (views handed out keep it alive)
+        """
+        self.records = None
+
+
+# ==================================================================== #
+#   Writing                                                            #
+# ==================================================================== #
+
+class CorpusWriter():
+    """
+    Append fixed width puzzle records to a corpus file.  The record
+    count in the header is only brought up to date by flush (and
+    close), so readers never see a record that is only partly written;
+    reopening with append = True drops anything past that count
+    """
+
+    def __init__( self, fileName, N, withSolution = True, maxCages = None, append = False ):
+        self.fileName = fileName
+        self.dtype = E.recordDtype( N, withSolution, maxCages )
+        self.N = N
+
+        if append and os.path.exists( fileName ):
+            self.f = open( fileName, 'r+b' )
+            dtype, self.count = E.readHeader( self.f )
+
+            #   (a file made with another maxCages keeps its layout)
+            if maxCages is None:
+                self.dtype = E.recordDtype( N, withSolution, dtype[ 'rules' ].shape[0] )
+            if dtype != self.dtype:
+                self.f.close()
+                raise ValueError, "%s holds puzzles of a different layout" % fileName
+            self.f.truncate( E.HEADER_SIZE + self.count * self.dtype.itemsize )
+            self.f.seek( 0, os.SEEK_END )
+
+        else:
+            self.f = open( fileName, 'w+b' )
+            self.count = 0
+            E.writeHeader( self.f, self.dtype, 0 )
+
+
+    def write( self, records ):
+        """
+        Append an array of records (see EncodeKenKen.encodePuzzles).
+        Return the index of the first of them
+        """
+        if records.dtype != self.dtype:
+            raise ValueError, "Records of a different layout than the corpus"
+
+        first = self.count
+        records.tofile( self.f )
+        self.count += len( records )
+        return first
+
+
+    def writePuzzles( self, puzzles, batchSize = BATCH_SIZE ):
+        """
+        Encode and append an iterable of puzzles (KenKen objects or
+        puzzle records), batchSize at a time.  Return the number written
+        """
+        withSolution = 'solution' in self.dtype.names
+        maxCages = self.dtype[ 'rules' ].shape[0]
+
+        n = 0
+        batch = []
+        for puzzle in puzzles:
+            batch.append( puzzle )
+            if len( batch ) == batchSize:
+                self.write( E.encodePuzzles( batch, self.N, withSolution, maxCages ) )
+                n += len( batch )
+                batch = []
+
+        if batch:
+            self.write( E.encodePuzzles( batch, self.N, withSolution, maxCages ) )
+            n += len( batch )
+
+        return n
+
+
+    def flush( self ):
+        """
+        Make everything written so far visible to new readers
+        """
+        self.f.flush()
+        self.f.seek( 0 )
+        E.writeHeader( self.f, self.dtype, self.count )
+        self.f.seek( 0, os.SEEK_END )
+        self.f.flush()
+
+
+    def close( self ):
+        if self.f is not None:
+            self.flush()
+            self.f.close()
+            self.f = None
@@ -7,4 +7,623 @@
 #                                                                      #
 ########################################################################
 
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+import multiprocessing
+
+import LatinSquare as LS
+import KenKenCage as KKC
+import BatchSolveKenKen as BSK
 import KenKenClass as k
+import SolveKenKen as SKK
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Re-roll the operations of the ambiguous cages this many times in a
+#   row before splitting a cell out of one of them
+REROLLS_BEFORE_SPLIT = 2
+
+#   The grades gradedKenKen can make.  KenKenCage leaves too few single
+#   cages for a puzzle to come out at CLEAN_SINGLES (none of 800 random
+#   4 x 4 - 7 x 7 puzzles did), so that grade is not offered
+GENERATED_GRADES = SKK.GRADES[ 1 : ]
+
+#   Candidates gradedKenKen tries before giving up.  At 6 x 6 the rarest
+#   grade (necessaryRuleValues) takes about 70 on average; on small
+#   boards it may never turn up at all
+MAX_GRADE_ATTEMPTS = 2000
+
+#   Puzzles written between flushes of a puzzle stream
+FLUSH_EVERY = 1000
+
+#   Puzzles handed to a worker at a time, and how many chunks per
+#   worker we ask for at once (as in BatchSolveKenKen)
+CHUNK_SIZE = 8
+CHUNKS_IN_FLIGHT = 4
+
+
+# ==================================================================== #
+#   Unique puzzles                                                     #
+# ==================================================================== #
+
+def uniqueKenKen( N = 6, timeLimit = None, statistics = None, rng = None ):
+    """
+    Generate a random N x N kenken with exactly one solution, and return
+    
+        ( kenken, retries )
+    
+    Whenever the solution counter (SolveKenKen.findSolutions, which
+    stops at the second solution) finds a second solution, only the
+    cages on which the two solutions differ are changed:  their
+    operations are re-rolled, and if that keeps failing a differing
+    cell is split out of its cage as an EQUALS cage.  Every split pins
+    down another cell, so this always ends.  If a uniqueness check runs
+    past timeLimit (seconds) the puzzle is thrown out for a fresh one.
+    If given a GenerationStatistics, it is updated along the way.  rng
+    is a random.Random (default the random module itself)
+    """
+    if statistics is None:
+        statistics = GenerationStatistics()
+    
+    startTime = time.time()
+    retries = 0
+    
+    while True:
+        kenken = k.KenKen( N, rng = rng )
+        fixes = makeUnique( kenken, timeLimit, statistics )
+        if fixes is not None:
+            retries += fixes
+            break
+        retries += 1
+    
+    statistics.add( retries, time.time() - startTime )
+    return kenken, retries
+
+
+def makeUnique( kenken, timeLimit = None, statistics = None ):
+    """
+    Change the rules of kenken in place (drawing from kenken.rng), as
+    described in uniqueKenKen, until it has exactly one solution.
+    Return the number of failed uniqueness checks along the way, or
+    None if a check ran past timeLimit (seconds)
+    """
+    if statistics is None:
+        statistics = GenerationStatistics()
+    
+    rng = kenken.rng
+    if rng is None:
+        rng = random
+    
+    retries = 0
+    rerolls = 0
+    
+    while True:
+        statistics.checks += 1
+        try:
+            solutions = SKK.findSolutions( kenken, 2, timeLimit = timeLimit )
+        except SKK.SolveTimeout:
+            statistics.timeouts += 1
+            return None
+        
+        if len( solutions ) == 1:
+            return retries
+        
+        retries += 1
+        differingNodes = ambiguousNodes( kenken, solutions )
+        
+        if rerolls < REROLLS_BEFORE_SPLIT:
+            statistics.rerolls += 1
+            rerolls += 1
+            rerollRules( kenken, differingNodes )
+        else:
+            statistics.splits += 1
+            rerolls = 0
+            splitNode( kenken, rng.choice( differingNodes ) )
+
+
+# ==================================================================== #
+#   Graded puzzles                                                     #
+# ==================================================================== #
+
+def gradedKenKen( N = 6, targetGrade = SKK.PARE_VALUES, timeLimit = None, statistics = None, rng = None,
+                  maxAttempts = MAX_GRADE_ATTEMPTS ):
+    """
+    Generate a random N x N kenken of difficulty targetGrade (one of
+    GENERATED_GRADES; ValueError for any other), and return
+        
+        ( kenken, retries )
+    
+    or raise GenerationFailed if none of maxAttempts candidates had that
+    grade
+    
+    Each candidate is graded with SolveKenKen.grade, which stops as soon
+    as the candidate needs a technique harder than targetGrade, so
+    rejecting a puzzle that is too hard costs less than a solve.  A
+    puzzle solved without search has exactly one solution, so only
+    SEARCH candidates need their solutions counted.  (They are not
+    fixed up as in uniqueKenKen:  the fixes almost always leave the
+    puzzle solvable without search, so it is cheaper to move on).  rng
+    is a random.Random (default the random module itself)
+    """
+    if targetGrade not in GENERATED_GRADES:
+        raise ValueError, "Can't generate puzzles of grade %s" % targetGrade
+    
+    if statistics is None:
+        statistics = GenerationStatistics()
+    
+    startTime = time.time()
+    
+    for retries in range( maxAttempts ):
+        kenken = k.KenKen( N, rng = rng )
+        if acceptGrade( kenken, targetGrade, timeLimit, statistics ):
+            statistics.add( retries, time.time() - startTime )
+            return kenken, retries
+    
+    raise GenerationFailed, "No %d x %d puzzle of grade %s in %d attempts" % ( N, N, targetGrade, maxAttempts )
+
+
+class GenerationFailed( Exception ):
+    """
+    Raised when a generator gives up (see gradedKenKen)
+    """
+    pass
+
+
+def acceptGrade( kenken, targetGrade, timeLimit = None, statistics = None ):
+    """
+    Decide whether kenken can be used as a puzzle of grade targetGrade
+    (see gradedKenKen)
+    """
+    if statistics is None:
+        statistics = GenerationStatistics()
+    
+    if targetGrade == SKK.SEARCH:
+        maxGrade = SKK.GRADES[ SKK.GRADES.index( SKK.SEARCH ) - 1 ]
+    else:
+        maxGrade = targetGrade
+    
+    try:
+        grade = SKK.grade( kenken, maxGrade, timeLimit = timeLimit )
+    except SKK.SolveTimeout:
+        statistics.timeouts += 1
+        return False
+    
+    if grade is None and targetGrade == SKK.SEARCH:
+        statistics.checks += 1
+        try:
+            if len( SKK.findSolutions( kenken, 2, timeLimit = timeLimit ) ) != 1:
+                statistics.ambiguous += 1
+                return False
+        except SKK.SolveTimeout:
+            statistics.timeouts += 1
+            return False
+        grade = SKK.SEARCH
+    
+    if grade is None:
+        statistics.tooHard += 1
+        return False
+    
+    if grade != targetGrade:
+        statistics.tooEasy += 1
+        return False
+    
+    return True
+
+
+def ambiguousNodes( kenken, solutions ):
+    """
+    The nodes at which some solution in solutions differs from the
+    intended solution of kenken
+    """
+    N = kenken.size
+    nodes = set()
+    for grid in solutions:
+        for i in range( N ):
+            for j in range( N ):
+                if grid[ i, j ] != kenken.solution[ i, j ]:
+                    nodes.add( (i,j) )
+    
+    return sorted( nodes )
+
+
+def rerollRules( kenken, nodes ):
+    """
+    Draw new random rules for the cages holding any of nodes, leaving
+    every other rule alone
+    """
+    nodeLists = set( kenken.getCage( node ) for node in nodes )
+    
+    ruleList = []
+    for rule in kenken.ruleList:
+        if tuple( rule[0] ) in nodeLists:
+            rule = kenken.createRule( rule[0] )
+        ruleList.append( rule )
+    
+    kenken.setRules( ruleList )
+
+
+def splitNode( kenken, node ):
+    """
+    Take node out of its cage and give it an EQUALS cage of its own.  If
+    that leaves the rest of its old cage in pieces, each piece becomes
+    a cage of its own (with a new random rule)
+    """
+    nodeList = kenken.getCage( node )
+    
+    ruleList = []
+    for rule in kenken.ruleList:
+        if tuple( rule[0] ) == nodeList:
+            rest = [ otherNode for otherNode in rule[0] if otherNode != node ]
+            ruleList.append( kenken.createRule( [ node ] ) )
+            for piece in connectedPieces( rest ):
+                ruleList.append( kenken.createRule( piece ) )
+        else:
+            ruleList.append( rule )
+    
+    kenken.setRules( ruleList )
+
+
+def connectedPieces( nodes ):
+    """
+    Split a list of nodes into lists of edge connected nodes
+    """
+    remaining = set( nodes )
+    pieces = []
+    
+    for node in nodes:
+        if node not in remaining:
+            continue
+        
+        remaining.remove( node )
+        piece = [ node ]
+        for ( i, j ) in piece:
+            for neighbor in [ (i+1,j), (i-1,j), (i,j+1), (i,j-1) ]:
+                if neighbor in remaining:
+                    remaining.remove( neighbor )
+                    piece.append( neighbor )
+        
+        pieces.append( sorted( piece ) )
+    
+    return pieces
+
+
+class GenerationStatistics():
+    """
+    Running totals for unique puzzle generation:  puzzles made, retries
+    (uniqueness checks that failed, or graded candidates thrown out),
+    and how each failure was handled (rerolls, splits, timeouts, too
+    easy, too hard, ambiguous), along with the time spent making them
+    (summed over workers) and the wall time, if generatePuzzles started
+    the clock
+    """
+    
+    def __init__( self ):
+        self.count = 0
+        self.retries = 0
+        self.checks = 0
+        self.rerolls = 0
+        self.splits = 0
+        self.timeouts = 0
+        self.tooEasy = 0
+        self.tooHard = 0
+        self.ambiguous = 0
+        self.generationTime = 0.
+        self.startTime = None
+        self.stopTime = None
+    
+    
+    def start( self ):
+        self.startTime = time.time()
+        self.stopTime = None
+    
+    
+    def stop( self ):
+        self.stopTime = time.time()
+    
+    
+    def add( self, retries, seconds ):
+        self.count += 1
+        self.retries += retries
+        self.generationTime += seconds
+    
+    
+    def merge( self, other ):
+        """
+        Add in the totals of another GenerationStatistics (e.g. one
+        kept by a worker process); the clock is this one's own
+        """
+        for ( key, value ) in other.__dict__.iteritems():
+            if key not in ( 'startTime', 'stopTime' ):
+                setattr( self, key, getattr( self, key ) + value )
+    
+    
+    def wallTime( self ):
+        """
+        Seconds since start (up to stop), or the time spent making the
+        puzzles if the clock never started (everything in one process)
+        """
+        if self.startTime is None:
+            return self.generationTime
+        if self.stopTime is None:
+            return time.time() - self.startTime
+        return self.stopTime - self.startTime
+
+    
+    def throughput( self ):
+        """
+        Unique puzzles per second of wall time
+        """
+        wallTime = self.wallTime()
+        if wallTime == 0:
+            return 0.
+        return self.count / wallTime
+    
+    
+    def asDict( self ):
+        return { 'count'          : self.count,
+                 'retries'        : self.retries,
+                 'checks'         : self.checks,
+                 'rerolls'        : self.rerolls,
+                 'splits'         : self.splits,
+                 'timeouts'       : self.timeouts,
+                 'tooEasy'        : self.tooEasy,
+                 'tooHard'        : self.tooHard,
+                 'ambiguous'      : self.ambiguous,
+                 'generationTime' : self.generationTime,
+                 'wallTime'       : self.wallTime(),
+                 'throughput'     : self.throughput() }
+    
+    
+    def report( self ):
+        """
+        One line summary
+        """
+        return '%d unique puzzles in %.2fs (%.1f / s; %.2fs generating) -- %d retries: %d rerolls, %d splits, ' \
+               '%d timeouts, %d too easy, %d too hard, %d ambiguous' % \
+               ( self.count, self.wallTime(), self.throughput(), self.generationTime, self.retries,
+                 self.rerolls, self.splits, self.timeouts, self.tooEasy, self.tooHard, self.ambiguous )
+
+
+# ==================================================================== #
+#   Puzzle streams                                                     #
+# ==================================================================== #
+
+def puzzleSeed( seed, index ):
+    """
+    The seed of puzzle number index of a stream, so that any puzzle of a
+    stream can be rebuilt (and a stream picked up again) on its own
+    """
+    return seed * 2**32 + index
+
+
+def createPuzzle( N, index, seed = 0, unique = False, grade = None, withSolution = True,
+                  timeLimit = None, statistics = None ):
+    """
+    Puzzle number index of the stream with the given seed, as a puzzle
+    record (see puzzleRecord).  Everything random is drawn from a
+    random.Random of its own (see puzzleSeed), so the puzzle is the same
+    whichever process makes it and in whatever order.  Plain puzzles
+    are built straight from a latin square and a cage list, without a
+    KenKen object; with unique or grade they come from uniqueKenKen /
+    gradedKenKen
+    """
+    rng = random.Random( puzzleSeed( seed, index ) )
+    
+    if grade is not None:
+        kenken, retries = gradedKenKen( N, grade, timeLimit, statistics, rng )
+        solution, ruleList = kenken.solution, kenken.ruleList
+    elif unique:
+        kenken, retries = uniqueKenKen( N, timeLimit, statistics, rng )
+        solution, ruleList = kenken.solution, kenken.ruleList
+    else:
+        solution = LS.randomLatinSquare( N, rng )
+        cages = KKC.KenKenCage( N, rng = rng ).getCageList()
+        ruleList = [ k.randomRule( cage, solution, rng ) for cage in cages ]
+    
+    if not withSolution:
+        solution = None
+    
+    return puzzleRecord( index, N, ruleList, solution )
+
+
+def generatePuzzles( N = 6, count = None, start = 0, seed = 0, unique = False, grade = None,
+                     withSolution = True, timeLimit = None, statistics = None,
+                     workers = 1, chunkSize = CHUNK_SIZE ):
+    """
+    Lazily yield the puzzle records (see createPuzzle) number start,
+    start + 1, ... up to count (forever if count is None), in order.
+    With more than one worker (None for one per core) the puzzles are
+    made across a pool of processes, only a few chunks per worker ahead
+    of what has been yielded.  The records are the same for any number
+    of workers as long as there is no timeLimit:  with one, whether a
+    check runs out of time depends on the machine and how busy it is,
+    and a puzzle that timed out is replaced by a different one.  If
+    given GenerationStatistics, they are updated as puzzles come in and
+    their clock runs from the first puzzle asked for
+    """
+    if count is None:
+        indices = itertools.count( start )
+    else:
+        indices = iter( xrange( start, count ) )
+    
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    
+    if statistics is not None:
+        statistics.start()
+    
+    if workers == 1:
+        for index in indices:
+            yield createPuzzle( N, index, seed, unique, grade, withSolution, timeLimit, statistics )
+    
+    else:
+        jobs = ( ( N, index, seed, unique, grade, withSolution, timeLimit ) for index in indices )
+        
+        pool = multiprocessing.Pool( workers )
+        window = workers * chunkSize * CHUNKS_IN_FLIGHT
+        slots = threading.Semaphore( window )
+        try:
+            #   (one imap over a bounded job stream, as in solveBatch, so
+            #   a slow puzzle never holds the workers up at a window's end)
+            for ( record, jobStatistics ) in pool.imap( createJob, BSK.boundedJobs( jobs, slots ), chunkSize ):
+                slots.release()
+                if statistics is not None:
+                    statistics.merge( jobStatistics )
+                yield record
+            
+            pool.close()
+        
+        except:
+            for i in range( window ):
+                slots.release()
+            pool.terminate()
+            raise
+        
+        finally:
+            pool.join()
+    
+    if statistics is not None:
+        statistics.stop()
+
+
+def createJob( job ):
+    """
+    Make one ( N, index, seed, unique, grade, withSolution, timeLimit )
+    puzzle and return it with its GenerationStatistics.  This runs in
+    the worker processes, so it has to live at the module level
+    """
+    statistics = GenerationStatistics()
+    return createPuzzle( *job, statistics = statistics ), statistics
+
+
+def puzzleRecord( index, N, ruleList, solution = None ):
+    """
+    A puzzle as plain python types:
+    
+        { 'index' : index, 'size' : N,
+          'cages' : [ [ [i,j], ... ], ... ],
+          'operations' : [ ... ], 'targets' : [ ... ],
+          'solution' : [ [ ... ], ... ] (if given) }
+    """
+    record = { 'index'      : index,
+               'size'       : N,
+               'cages'      : [ [ [ int( i ), int( j ) ] for ( i, j ) in rule[0] ] for rule in ruleList ],
+               'operations' : [ int( rule[1] ) for rule in ruleList ],
+               'targets'    : [ int( rule[2] ) for rule in ruleList ] }
+    
+    if solution is not None:
+        record[ 'solution' ] = [ [ int( val ) for val in row ] for row in solution ]
+    
+    return record
+
+
+def writePuzzles( records, f, flushEvery = FLUSH_EVERY ):
+    """
+    Write puzzle records one json object per line to the open file f,
+    flushing every flushEvery records.  Only the record being written
+    is ever held in memory.  Return the number written
+    """
+    n = 0
+    for record in records:
+        f.write( json.dumps( record, separators = ( ',', ':' ), sort_keys = True ) + '\n' )
+        n += 1
+        if n % flushEvery == 0:
+            f.flush()
+    
+    f.flush()
+    return n
+
+
+def readPuzzles( fileName ):
+    """
+    Lazily yield the puzzle records of a jsonl file written by
+    writePuzzles
+    """
+    f = open( fileName )
+    try:
+        for line in f:
+            if line.endswith( '\n' ):
+                yield json.loads( line )
+    finally:
+        f.close()
+
+
+def resumeIndex( fileName ):
+    """
+    Get a jsonl file written by writePuzzles ready to be appended to:
+    cut off a last line left half written by an interruption, and
+    return the index of the next puzzle (0 if there is no file)
+    """
+    if not os.path.exists( fileName ):
+        return 0
+    
+    f = open( fileName, 'rb+' )
+    try:
+        offset = 0
+        lastRecord = None
+        for line in f:
+            if not line.endswith( '\n' ):
+                break
+            offset += len( line )
+            lastRecord = line
+        f.truncate( offset )
+    finally:
+        f.close()
+    
+    if lastRecord is None:
+        return 0
+    return json.loads( lastRecord )[ 'index' ] + 1
+
+
+# ==================================================================== #
+#   Command line                                                       #
+# ==================================================================== #
+
+def main( argv = None ):
+    parser = argparse.ArgumentParser( description = 'Stream random kenken puzzles as jsonl' )
+    parser.add_argument( '-n', '--size', type = int, default = 6 )
+    parser.add_argument( '-c', '--count', type = int, default = None, help = 'total puzzles (default: forever)' )
+    parser.add_argument( '-s', '--seed', type = int, default = 0 )
+    parser.add_argument( '-o', '--output', default = None, help = 'jsonl file to write (or resume); default stdout' )
+    parser.add_argument( '-u', '--unique', action = 'store_true' )
+    parser.add_argument( '-g', '--grade', choices = GENERATED_GRADES, default = None )
+    parser.add_argument( '-t', '--time-limit', type = float, default = None )
+    parser.add_argument( '-f', '--flush-every', type = int, default = FLUSH_EVERY )
+    parser.add_argument( '-w', '--workers', type = int, default = 1, help = '0 for one per core' )
+    parser.add_argument( '--no-solution', action = 'store_true' )
+    args = parser.parse_args( argv )
+    
+    statistics = GenerationStatistics()
+    
+    if args.output is None:
+        start = 0
+        f = sys.stdout
+    else:
+        start = resumeIndex( args.output )
+        f = open( args.output, 'ab' )
+    
+    try:
+        records = generatePuzzles( args.size, args.count, start, args.seed, args.unique, args.grade,
+                                   not args.no_solution, args.time_limit, statistics,
+                                   args.workers or None )
+        n = writePuzzles( records, f, args.flush_every )
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    
+    print >> sys.stderr, '%d puzzles written, starting at %d' % ( n, start )
+    if statistics.count:
+        print >> sys.stderr, statistics.report()
+
+
+if __name__ == '__main__':
+    main()
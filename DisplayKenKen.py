@@ -135,6 +135,7 @@ class KenKenDisplay():
         Draw the non-border boundaries of cages and label them with the
         operation and value
         """
+        self.cageDic = k.cageDic
         for rule in k.ruleList:
             self.drawCage( rule )
             self.labelCage( rule )
@@ -173,7 +174,7 @@ class KenKenDisplay():
             if j != self.N - 1:
                 neighborNode = ( i, j + 1 )
         
-        return neighborNode not in cage
+        return self.cageDic.get( neighborNode ) != tuple( cage )
 
 
     def drawEdge( self, node, direction ):
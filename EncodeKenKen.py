@@ -0,0 +1,290 @@
+########################################################################
+#                                                                      #
+#   EncodeKenKen.py                                                    #
+#       Created: Feb 9, 2013                                           #
+#                                                                      #
+#       A module for packing ken ken problems into compact, fixed      #
+#       width binary records                                           #
+#                                                                      #
+########################################################################
+
+import struct
+import itertools
+
+import numpy
+
+import KenKenClass as K
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   A rule is packed into a uint32 as operation << TARGET_BITS | target.
+#   Targets up to 2**29 - 1 hold the product of any nine values of 1 - 9
+#   (9**9 = 387420489); bigger ones can't be encoded
+OPERATION_BITS = 3
+TARGET_BITS = 29
+TARGET_MASK = ( 1 << TARGET_BITS ) - 1
+
+#   File header:  magic, version, N, flags, (padding), maxCages, count
+MAGIC = 'KKEN'
+VERSION = 1
+HEADER_FORMAT = '<4sBBBxIQ'
+HEADER_SIZE = 32
+WITH_SOLUTION = 1
+
+
+# ==================================================================== #
+#   Records                                                            #
+# ==================================================================== #
+
+def recordDtype( N, withSolution = True, maxCages = None ):
+    """
+    The numpy dtype of one N x N puzzle:
+
+        cages       N x N cage ids (uint8, or little endian uint16 past
+                    256 cages)
+        rules       maxCages (default N * N, as every node could be a
+                    cage of its own) packed little endian uint32
+                    rules, rule i being that of cage id i (0 past the
+                    last cage)
+        solution    N x N uint8 grid (only if withSolution)
+
+    Every field is little endian, so files are the same on any machine.
+    A 9 x 9 puzzle with its solution takes 486 bytes
+    """
+    if maxCages is None:
+        maxCages = N * N
+
+    if maxCages <= 256:
+        cageType = 'u1'
+    else:
+        cageType = '<u2'
+
+    fields = [ ( 'cages', cageType, ( N, N ) ),
+               ( 'rules', '<u4', ( maxCages, ) ) ]
+    if withSolution:
+        fields.append( ( 'solution', 'u1', ( N, N ) ) )
+
+    return numpy.dtype( fields )
+
+
+def packRules( operations, targets ):
+    """
+    Pack arrays of operations and targets (of any, matching, shape) into
+    uint32 rules.  Raises ValueError for a target past TARGET_MASK
+    """
+    operations = numpy.asarray( operations, dtype = numpy.uint32 )
+    targets = numpy.asarray( targets, dtype = numpy.int64 )
+
+    if ( targets < 0 ).any() or ( targets > TARGET_MASK ).any():
+        raise ValueError, "Targets have to fit in %d bits" % TARGET_BITS
+    if ( operations >= 1 << OPERATION_BITS ).any():
+        raise ValueError, "Operations have to fit in %d bits" % OPERATION_BITS
+
+    return ( operations << TARGET_BITS ) | targets.astype( numpy.uint32 )
+
+
+def unpackRules( rules ):
+    """
+    Split an array of packed rules into ( operations, targets ) arrays
+    """
+    rules = numpy.asarray( rules, dtype = numpy.uint32 )
+    return rules >> TARGET_BITS, rules & TARGET_MASK
+
+
+# ==================================================================== #
+#   Bulk encoding and decoding                                         #
+# ==================================================================== #
+
+def encodePuzzles( puzzles, N, withSolution = True, maxCages = None ):
+    """
+    Encode a sequence of N x N puzzles (KenKen objects, or puzzle
+    records as made by CreateKenKen) into a numpy array of records (see
+    recordDtype).  Only the rules are walked in python, a cage at a
+    time; which puzzle, cage id, and cell every node belongs to is
+    worked out from the cage counts and lengths with array operations,
+    and written into the whole array at once
+    """
+    dtype = recordDtype( N, withSolution, maxCages )
+    maxCages = dtype[ 'rules' ].shape[0]
+    M = len( puzzles )
+
+    nodeLists, cageCounts, operations, targets = [], [], [], []
+    solutions = numpy.zeros( ( M, N, N ), dtype = numpy.uint8 )
+
+    for ( a, puzzle ) in enumerate( puzzles ):
+        ruleList, solution = puzzleRules( puzzle )
+        if len( ruleList ) > maxCages:
+            raise ValueError, "Puzzle %d has more than %d cages" % ( a, maxCages )
+
+        cageCounts.append( len( ruleList ) )
+        for ( nodeList, operation, target ) in ruleList:
+            nodeLists.append( nodeList )
+            operations.append( operation )
+            targets.append( target )
+
+        if withSolution:
+            if solution is None:
+                raise ValueError, "Puzzle %d has no solution to store" % a
+            solutions[ a ] = solution
+
+    records = numpy.zeros( M, dtype = dtype )
+
+    #   Puzzle and cage id of every cage, then of every node
+    cageCounts = numpy.array( cageCounts, dtype = int )
+    cagePuzzles = numpy.repeat( numpy.arange( M ), cageCounts )
+    cageIds = numpy.arange( len( nodeLists ) ) - numpy.repeat( numpy.cumsum( cageCounts ) - cageCounts, cageCounts )
+    lengths = numpy.array( [ len( nodeList ) for nodeList in nodeLists ], dtype = int )
+    nodes = numpy.array( list( itertools.chain.from_iterable( nodeLists ) ), dtype = int ).reshape( -1, 2 )
+
+    cages = records[ 'cages' ].reshape( M, N * N )
+    cages[ numpy.repeat( cagePuzzles, lengths ), nodes[ :, 0 ] * N + nodes[ :, 1 ] ] = numpy.repeat( cageIds, lengths )
+    records[ 'cages' ] = cages.reshape( M, N, N )
+
+    rules = records[ 'rules' ]
+    rules[ cagePuzzles, cageIds ] = packRules( operations, targets )
+    records[ 'rules' ] = rules
+
+    if withSolution:
+        records[ 'solution' ] = solutions
+
+    return records
+
+
+def decodeArrays( records ):
+    """
+    Unpack an array of records into plain arrays, all at once:
+
+        ( cages, operations, targets, cageCounts, solutions )
+
+    with cages M x N x N, operations and targets M x maxCages,
+    cageCounts M, and solutions M x N x N (None if not stored)
+    """
+    M = len( records )
+    operations, targets = unpackRules( records[ 'rules' ] )
+    cages = records[ 'cages' ]
+
+    if M:
+        cageCounts = cages.reshape( M, -1 ).max( axis = 1 ).astype( int ) + 1
+    else:
+        cageCounts = numpy.zeros( 0, dtype = int )
+
+    solutions = None
+    if 'solution' in records.dtype.names:
+        solutions = records[ 'solution' ]
+
+    return cages, operations, targets, cageCounts, solutions
+
+
+def decodeRules( records ):
+    """
+    Yield ( ruleList, solution ) for every record, with the rules in
+    cage id order and the nodes of each cage in row major order
+    (solution is None if not stored)
+    """
+    cages, operations, targets, cageCounts, solutions = decodeArrays( records )
+    M = len( records )
+    if M == 0:
+        return
+
+    N = cages.shape[1]
+    flatCages = cages.reshape( M, N * N )
+
+    #   Cells sorted by cage id (stable, so row major within a cage) and
+    #   where each cage starts in that order, for every record at once
+    order = numpy.argsort( flatCages, axis = 1, kind = 'mergesort' )
+    sortedIds = flatCages[ numpy.arange( M )[ :, None ], order ]
+
+    for a in range( M ):
+        starts = numpy.searchsorted( sortedIds[ a ], numpy.arange( cageCounts[ a ] + 1 ) )
+        cells = order[ a ]
+
+        ruleList = []
+        for cageId in range( cageCounts[ a ] ):
+            nodeList = [ divmod( int( c ), N ) for c in cells[ starts[ cageId ] : starts[ cageId + 1 ] ] ]
+            ruleList.append( ( nodeList, int( operations[ a, cageId ] ), int( targets[ a, cageId ] ) ) )
+
+        solution = None
+        if solutions is not None:
+            solution = solutions[ a ].astype( int )
+
+        yield ruleList, solution
+
+
+def decodePuzzles( records ):
+    """
+    Return a list of KenKen objects, one per record (see decodeRules)
+    """
+    N = records.dtype[ 'cages' ].shape[0]
+    return [ K.KenKen( N, solution, ruleList = ruleList ) for ( ruleList, solution ) in decodeRules( records ) ]
+
+
+def puzzleRules( puzzle ):
+    """
+    The ( ruleList, solution ) of a KenKen object or of a puzzle record
+    """
+    if isinstance( puzzle, dict ):
+        ruleList = zip( puzzle[ 'cages' ], puzzle[ 'operations' ], puzzle[ 'targets' ] )
+        return ruleList, puzzle.get( 'solution' )
+
+    return puzzle.ruleList, puzzle.solution
+
+
+# ==================================================================== #
+#   Files                                                              #
+# ==================================================================== #
+
+def savePuzzles( fileName, records ):
+    """
+    Write an array of records to fileName, after a header holding its
+    layout (see readHeader)
+    """
+    f = open( fileName, 'wb' )
+    try:
+        writeHeader( f, records.dtype, len( records ) )
+        records.tofile( f )
+    finally:
+        f.close()
+
+
+def loadPuzzles( fileName ):
+    """
+    Read back an array of records written by savePuzzles
+    """
+    f = open( fileName, 'rb' )
+    try:
+        dtype, count = readHeader( f )
+        return numpy.fromfile( f, dtype = dtype, count = count )
+    finally:
+        f.close()
+
+
+def writeHeader( f, dtype, count ):
+    N = dtype[ 'cages' ].shape[0]
+    maxCages = dtype[ 'rules' ].shape[0]
+    flags = 0
+    if 'solution' in dtype.names:
+        flags |= WITH_SOLUTION
+
+    header = struct.pack( HEADER_FORMAT, MAGIC, VERSION, N, flags, maxCages, count )
+    f.write( header + '\0' * ( HEADER_SIZE - len( header ) ) )
+
+
+def readHeader( f ):
+    """
+    Read the header at the start of a puzzle file and return
+    ( record dtype, record count )
+    """
+    header = f.read( HEADER_SIZE )
+    if len( header ) != HEADER_SIZE:
+        raise ValueError, "Not a puzzle file (too short)"
+
+    magic, version, N, flags, maxCages, count = struct.unpack( HEADER_FORMAT, header[ : struct.calcsize( HEADER_FORMAT ) ] )
+    if magic != MAGIC:
+        raise ValueError, "Not a puzzle file"
+    if version != VERSION:
+        raise ValueError, "Unknown puzzle file version %d" % version
+
+    return recordDtype( N, ( flags & WITH_SOLUTION ) != 0, maxCages ), count
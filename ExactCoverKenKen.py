@@ -0,0 +1,385 @@
+########################################################################
+#                                                                      #
+#   ExactCoverKenKen.py                                                #
+#       Created: Feb 16, 2013                                          #
+#                                                                      #
+#       A module for solving ken ken problems as exact cover problems  #
+#       with dancing links (Knuth's Algorithm X)                       #
+#                                                                      #
+########################################################################
+
+import time
+
+import scipy
+
+import CageCombinations as CC
+import SolveKenKen as SKK
+from KenKenClass import EQUALS
+
+
+# ==================================================================== #
+#   Headless solving                                                   #
+# ==================================================================== #
+
+def solve( k, timeLimit = None ):
+    """
+    Solve the kenken object k and return a SolveKenKen.SolveResult, just
+    as SolveKenKen.solve does.  If timeLimit (seconds) runs out first
+    the status is TIMEOUT; the time limit starts here, so it covers
+    building the links as well as the search
+    """
+    startTime = time.time()
+    deadline = deadlineFrom( startTime, timeLimit )
+    try:
+        solver = ExactCoverSolver( k, deadline )
+    except SKK.SolveTimeout:
+        eliminations = dict( ( technique, 0 ) for technique in SKK.TECHNIQUES )
+        return SKK.SolveResult( SKK.TIMEOUT, scipy.zeros( ( k.size, k.size ), dtype = int ), 0, 0, \
+                                eliminations, time.time() - startTime )
+
+    return solver.solve( timeLeft( deadline ) )
+
+
+def findSolutions( k, limit = 2, timeLimit = None ):
+    """
+    Return a list of up to limit solution grids of the kenken object k,
+    as SolveKenKen.findSolutions does.  Raises SolveKenKen.SolveTimeout
+    if timeLimit (seconds, building the links included) runs out first
+    """
+    deadline = deadlineFrom( time.time(), timeLimit )
+    solver = ExactCoverSolver( k, deadline )
+    return solver.findSolutions( limit, timeLeft( deadline ) )
+
+
+def deadlineFrom( startTime, timeLimit ):
+    """
+    The time.time() at which timeLimit seconds from startTime run out
+    (None for no limit)
+    """
+    if timeLimit is None:
+        return None
+    return startTime + timeLimit
+
+
+def timeLeft( deadline ):
+    """
+    Seconds left until deadline (None for no deadline)
+    """
+    if deadline is None:
+        return None
+    return max( 0, deadline - time.time() )
+
+
+# ==================================================================== #
+#   Exact cover solver                                                 #
+# ==================================================================== #
+
+class ExactCoverSolver():
+    """
+    The kenken as an exact cover problem.  The items (columns) are
+
+        node (i,j) is filled                N * N of these
+        line i of the first index holds v   N * N
+        line j of the second index holds v  N * N
+
+    and there is one option (row) for every allowed ordered tuple of
+    values of every cage, covering the nodes of the cage and the line /
+    value items of each of its nodes.  Every node is in exactly one
+    cage, so an exact cover picks one tuple per cage with every line a
+    permutation of 1 - N.  The links are kept in flat integer lists:
+    node 0 is the root, nodes 1 - numItems are the item headers, and
+    the rest are the option nodes.  A search that runs out of time
+    uncovers everything on its way out, so the solver can be searched
+    again afterwards
+    """
+
+    #   Constructor / Destructor  --------------------------------------
+    def __init__( self, k, deadline = None ):
+        """
+        Given the kenken object, build the dancing links structure.
+        Big cages have a great many tuples, so if deadline (a
+        time.time() value) passes while building, raise
+        SolveKenKen.SolveTimeout
+        """
+        startTime = time.time()
+        self.k = k
+        self.size = k.size
+        self.iterations = 0
+        self.branches = 0
+        self.deadline = deadline
+
+        N = self.size
+        numItems = 3 * N * N
+        self.numItems = numItems
+
+        #   left, right, up, down, item header of each node; size of
+        #   each item; option index of each option node
+        self.L = range( -1, numItems ) ; self.L[0] = numItems
+        self.R = range( 1, numItems + 2 ) ; self.R[ numItems ] = 0
+        self.U = range( numItems + 1 )
+        self.D = range( numItems + 1 )
+        self.C = range( numItems + 1 )
+        self.S = [ 0 ] * ( numItems + 1 )
+        self.optionOf = [ -1 ] * ( numItems + 1 )
+
+        #   option index : ( nodeList, values )
+        self.options = []
+        for ( nodeList, operation, value ) in k.ruleList:
+            for values in cageTuples( operation, value, len( nodeList ), N, self.checkDeadline ):
+                self.checkDeadline()
+                self.addOption( nodeList, values )
+        
+        self.deadline = None
+        self.chosen = []
+        self.timeoutGrid = None
+        self.buildTime = time.time() - startTime
+
+
+    def __del__( self ):
+        """
+        Deallocate anything that needs to be
+        """
+        pass
+
+
+    #   Building  ------------------------------------------------------
+    def checkDeadline( self ):
+        """
+        Raise SolveKenKen.SolveTimeout if we are past the deadline (if
+        any)
+        """
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SKK.SolveTimeout
+
+
+    def items( self, nodeList, values ):
+        """
+        The items covered by giving the nodes of nodeList the values in
+        values, or None if that would cover an item twice (two equal
+        values in one line of the same cage)
+        """
+        N = self.size
+        itemList = []
+        for ( ( i, j ), val ) in zip( nodeList, values ):
+            itemList.append( 1 + i * N + j )
+            itemList.append( 1 + N * N + i * N + val - 1 )
+            itemList.append( 1 + 2 * N * N + j * N + val - 1 )
+
+        if len( set( itemList ) ) != len( itemList ):
+            return None
+        return itemList
+
+
+    def addOption( self, nodeList, values ):
+        """
+        Add an option (a row of links) for the cage nodeList taking the
+        values in values
+        """
+        itemList = self.items( nodeList, values )
+        if itemList is None:
+            return
+
+        optionIndex = len( self.options )
+        self.options.append( ( nodeList, values ) )
+
+        first = len( self.C )
+        for ( a, item ) in enumerate( itemList ):
+            node = first + a
+            self.C.append( item )
+            self.optionOf.append( optionIndex )
+
+            #   Insert at the bottom of the item's column
+            self.U.append( self.U[ item ] )
+            self.D.append( item )
+            self.D[ self.U[ item ] ] = node
+            self.U[ item ] = node
+            self.S[ item ] += 1
+
+            #   ... and at the end of the option's row
+            if a == 0:
+                self.L.append( node )
+                self.R.append( node )
+            else:
+                self.L.append( node - 1 )
+                self.R.append( first )
+                self.R[ node - 1 ] = node
+                self.L[ first ] = node
+
+
+    #   Major solver routines  -----------------------------------------
+    def solve( self, timeLimit = None ):
+        """
+        Search for a solution and return a SolveKenKen.SolveResult.  The
+        wall time includes building the links, which can take longer
+        than the search itself
+        """
+        startTime = time.time()
+        try:
+            solutions = self.findSolutions( 1, timeLimit )
+            if solutions:
+                status, grid = SKK.SOLVED, solutions[0]
+            else:
+                status, grid = SKK.CONTRADICTION, scipy.zeros( ( self.size, self.size ), dtype = int )
+
+        except SKK.SolveTimeout:
+            status, grid = SKK.TIMEOUT, self.timeoutGrid
+
+        eliminations = dict( ( technique, 0 ) for technique in SKK.TECHNIQUES )
+        return SKK.SolveResult( status, grid, self.iterations, self.branches, \
+                                eliminations, self.buildTime + time.time() - startTime )
+
+
+    def findSolutions( self, limit = 2, timeLimit = None ):
+        """
+        Return a list of up to limit solution grids
+        """
+        if timeLimit is not None:
+            self.deadline = time.time() + timeLimit
+
+        solutions = []
+        try:
+            self.search( solutions, limit )
+        finally:
+            self.deadline = None
+
+        return solutions
+
+
+    def search( self, solutions, limit ):
+        """
+        Algorithm X:  cover the item with the fewest options left, and
+        try each of its options in turn, covering everything else that
+        option covers
+        """
+        self.iterations += 1
+        try:
+            self.checkDeadline()
+        except SKK.SolveTimeout:
+            #   (the grid as it stands, before the levels above unwind)
+            self.timeoutGrid = self.grid()
+            raise
+
+        R, D, S, C = self.R, self.D, self.S, self.C
+
+        if R[0] == 0:
+            solutions.append( self.grid() )
+            return
+
+        item, best = None, None
+        c = R[0]
+        while c != 0:
+            if best is None or S[c] < best:
+                item, best = c, S[c]
+                if best == 0:
+                    return
+            c = R[c]
+
+        self.cover( item )
+        try:
+            r = D[ item ]
+            while r != item:
+                self.branches += 1
+                self.chosen.append( self.optionOf[r] )
+
+                j = R[r]
+                while j != r:
+                    self.cover( C[j] )
+                    j = R[j]
+
+                try:
+                    self.search( solutions, limit )
+
+                finally:
+                    j = self.L[r]
+                    while j != r:
+                        self.uncover( C[j] )
+                        j = self.L[j]
+
+                    self.chosen.pop()
+
+                if len( solutions ) >= limit:
+                    break
+                r = D[r]
+
+        finally:
+            self.uncover( item )
+
+
+    def cover( self, item ):
+        """
+        Take item out of the header list, and every option using it
+        out of the other items' columns
+        """
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+
+        R[ L[item] ] = R[item]
+        L[ R[item] ] = L[item]
+
+        i = D[item]
+        while i != item:
+            j = R[i]
+            while j != i:
+                D[ U[j] ] = D[j]
+                U[ D[j] ] = U[j]
+                S[ C[j] ] -= 1
+                j = R[j]
+            i = D[i]
+
+
+    def uncover( self, item ):
+        """
+        Undo cover( item ), in exactly the reverse order
+        """
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+
+        i = U[item]
+        while i != item:
+            j = L[i]
+            while j != i:
+                S[ C[j] ] += 1
+                D[ U[j] ] = j
+                U[ D[j] ] = j
+                j = L[j]
+            i = U[i]
+
+        R[ L[item] ] = item
+        L[ R[item] ] = item
+
+
+    def grid( self ):
+        """
+        Return an N x N array of the values of the options chosen so far
+        (0 where a node isn't covered yet)
+        """
+        N = self.size
+        a = scipy.zeros( ( N, N ), dtype = int )
+        for optionIndex in self.chosen:
+            nodeList, values = self.options[ optionIndex ]
+            for ( node, val ) in zip( nodeList, values ):
+                a[ node ] = val
+
+        return a
+
+
+# ==================================================================== #
+#   Cage tuples                                                        #
+# ==================================================================== #
+
+def cageTuples( operation, value, l, N, check = None ):
+    """
+    Every ordered tuple of l values from 1 - N satisfying the rule
+    ( operation, value ).  If given, check is called before each
+    combination's orderings are added (the solver passes its deadline
+    check)
+    """
+    if operation == EQUALS:
+        return [ ( int( value ), ) ]
+
+    tuples = []
+    for combination in CC.valueCombinations( operation, value, l, N ):
+        if check is not None:
+            check()
+        tuples.extend( CC.valueOrderings( combination ) )
+
+    return tuples
+
@@ -0,0 +1,286 @@
+########################################################################
+#                                                                      #
+#   HintKenKen.py                                                      #
+#       Created: Feb 18, 2013                                          #
+#                                                                      #
+#       A module for finding the next step of a ken ken problem, with  #
+#       the reason for it                                              #
+#                                                                      #
+########################################################################
+
+import time
+
+import SolveKenKen as SKK
+from KenKenClass import EQUALS, PLUS, TIMES, MINUS, DIVIDE
+from SolveKenKen import listFromMask, isSingleton
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Seconds a hint may take before we give up on it
+HINT_TIME_LIMIT = .05
+
+#   Where a hint comes from
+CAGE = 'cage'
+ROW = 'row'
+COLUMN = 'column'
+BOARD = 'board'
+
+OPERATION_SYMBOLS = { EQUALS : '', PLUS : '+', TIMES : 'x', MINUS : '-', DIVIDE : '/' }
+
+
+# ==================================================================== #
+#   Hints                                                              #
+# ==================================================================== #
+
+def hint( k, entries = None, timeLimit = HINT_TIME_LIMIT ):
+    """
+    The first hint for the kenken object k with the numbers in entries
+    (node : value) filled in, or None (see nextHint).  Asking again
+    gives the same hint; to walk on from one hint to the next, keep a
+    hintSolver and call nextHint on it with apply = True
+    """
+    return nextHint( hintSolver( k, entries ), timeLimit )
+
+
+def hintSolver( k, entries = None ):
+    """
+    A KenKenSolver for the kenken object k with the numbers in entries
+    (node : value) filled in and nothing else deduced yet, ready for
+    nextHint
+    """
+    solver = SKK.KenKenSolver( k )
+    if entries:
+        for ( node, value ) in entries.iteritems():
+            solver.narrowNode( node, 1 << value )
+        
+        #   (nextHint works from a solver at rest, with empty work lists)
+        solver.restoreState( solver.saveState() )
+
+    return solver
+
+
+def nextHint( solver, timeLimit = HINT_TIME_LIMIT, apply = False ):
+    """
+    Find a single deduction from the current state of a KenKenSolver,
+    trying the techniques from cheapest to dearest and the units of
+    each one at a time:
+
+        givens              single node cages
+        line singles        values solved elsewhere in a row or column,
+                            and values with one place left in it
+        cages               pareRule
+        subsets             reduceLine
+        necessary values    necessaryRuleValues
+
+    and stopping at the first one which removes anything.  Return it as
+    a Hint, or None if nothing was found within timeLimit seconds (or
+    at all, e.g. because only search will do).  The solver is left as
+    it was, unless apply is True, in which case the hint's eliminations
+    are kept.  The solver's deadline is set for the walk, so a long
+    unit (the necessary values pass most of all) gives up part way
+    through too
+    """
+    deadline = time.time() + timeLimit
+    solver.deadline = deadline
+    try:
+        for ( technique, unit, run, args ) in hintUnits( solver ):
+            if time.time() > deadline:
+                return None
+
+            result = tryUnit( solver, technique, unit, run, args, apply )
+            if result is not None:
+                return result
+
+    finally:
+        solver.deadline = None
+
+    return None
+
+
+def hintUnits( solver ):
+    """
+    Yield ( technique, unit, method, args ) for every unit nextHint
+    looks at, in the order it looks at them
+    """
+    N = solver.size
+    rules = [ rule for rule in solver.ruleList if rule[1] != EQUALS ]
+
+    for rule in solver.ruleList:
+        if rule[1] == EQUALS:
+            node = rule[0][0]
+            yield SKK.CLEAN_SINGLES, ( CAGE, rule ), solver.narrowNode, ( node, 1 << rule[2] )
+
+    for lineIndex in range( N ):
+        yield SKK.CLEAN_SINGLES, ( ROW, lineIndex ), lineSingles, ( solver, rowNodes( N, lineIndex ) )
+        yield SKK.CLEAN_SINGLES, ( COLUMN, lineIndex ), lineSingles, ( solver, columnNodes( N, lineIndex ) )
+
+    for rule in rules:
+        yield SKK.PARE_VALUES, ( CAGE, rule ), solver.pareRule, ( rule, )
+
+    for lineIndex in range( N ):
+        yield SKK.SUB_GROUPS, ( ROW, lineIndex ), solver.reduceLine, ( rowNodes( N, lineIndex ), )
+        yield SKK.SUB_GROUPS, ( COLUMN, lineIndex ), solver.reduceLine, ( columnNodes( N, lineIndex ), )
+
+    yield SKK.NECESSARY_RULE_VALUES, ( BOARD, None ), necessaryValues, ( solver, rules )
+
+
+def tryUnit( solver, technique, unit, run, args, apply = False ):
+    """
+    Run one unit on the solver and return a Hint if it removed anything
+    (None otherwise, or if the solver's deadline passed part way
+    through), putting the solver back as it was unless apply is True
+    and there is a hint
+    """
+    state = solver.saveState()
+    before = state[0]
+
+    solver.technique = technique
+    try:
+        run( *args )
+
+    except SKK.SolveTimeout:
+        solver.restoreState( state )
+        return None
+
+    changes = [ ( node, before[ node ] & ~mask, mask ) for ( node, mask ) in sorted( solver.possDic.iteritems() ) \
+                if mask != before[ node ] ]
+
+    if changes == [] or not apply:
+        solver.restoreState( state )
+    else:
+        #   Keep the eliminations, but leave the solver at rest again
+        solver.restoreState( solver.saveState() )
+
+    if changes == []:
+        return None
+
+    return Hint( technique, unit, changes, justification( solver.size, unit, changes ) )
+
+
+def justification( N, unit, changes ):
+    """
+    The nodes a hint rests on:  the nodes of its cage, the other nodes
+    of its row or column, or, for necessary values, the other nodes of
+    the rows and columns it changed
+    """
+    kind, index = unit
+    changed = set( node for ( node, removed, remaining ) in changes )
+
+    if kind == CAGE:
+        return list( index[0] )
+
+    if kind == ROW:
+        lineNodes = rowNodes( N, index )
+    elif kind == COLUMN:
+        lineNodes = columnNodes( N, index )
+    else:
+        lineNodes = set()
+        for ( i, j ) in changed:
+            lineNodes.update( rowNodes( N, j ) )
+            lineNodes.update( columnNodes( N, i ) )
+        lineNodes = sorted( lineNodes )
+
+    return [ node for node in lineNodes if node not in changed ]
+
+
+def lineSingles( solver, lineNodes ):
+    """
+    reduceLine without the subsets:  drop solved values from the rest
+    of the line, and pin down values with only one place left
+    """
+    techniques = solver.techniques
+    solver.techniques = techniques - set( [ SKK.SUB_GROUPS ] )
+    try:
+        solver.reduceLine( lineNodes )
+    finally:
+        solver.techniques = techniques
+
+
+def necessaryValues( solver, rules ):
+    """
+    necessaryRuleValues, on fresh cage tuples.  It works from solveDic,
+    and the pareRule passes above left nothing behind when they found
+    nothing, so pare every rule again first (which can't change any
+    node now, or we wouldn't have got this far)
+    """
+    for rule in rules:
+        solver.pareRule( rule )
+    solver.necessaryRuleValues()
+
+
+def rowNodes( N, rowIndex ):
+    """
+    The nodes of a row, as reduceRow sees them
+    """
+    return [ ( i, rowIndex ) for i in range( N ) ]
+
+
+def columnNodes( N, columnIndex ):
+    """
+    The nodes of a column, as reduceColumn sees them
+    """
+    return [ ( columnIndex, i ) for i in range( N ) ]
+
+
+class Hint():
+    """
+    One deduction:
+
+        technique       the SolveKenKen technique it came from
+        unit            ( CAGE, rule ), ( ROW, index ), ( COLUMN, index ),
+                        or ( BOARD, None )
+        changes         list of ( node, removed mask, remaining mask )
+        cells           the nodes it rests on
+    """
+
+    def __init__( self, technique, unit, changes, cells ):
+        self.technique = technique
+        self.unit = unit
+        self.changes = changes
+        self.cells = cells
+
+
+    def __repr__( self ):
+        return 'Hint( %s )' % self.describe()
+
+
+    def placements( self ):
+        """
+        ( node, value ) for every node the hint pins down
+        """
+        return [ ( node, listFromMask( remaining )[0] ) for ( node, removed, remaining ) in self.changes \
+                 if isSingleton( remaining ) ]
+
+
+    def eliminations( self ):
+        """
+        ( node, removed values ) for every node the hint changes
+        """
+        return [ ( node, listFromMask( removed ) ) for ( node, removed, remaining ) in self.changes ]
+
+
+    def describe( self ):
+        """
+        The hint in words, e.g. "(2, 3) must be 4 because of the cage
+        12x at (2, 3) (2, 4)"
+        """
+        kind, index = self.unit
+        if kind == CAGE:
+            nodeList, operation, value = index
+            reason = 'the cage %d%s at %s' % ( value, OPERATION_SYMBOLS[ operation ],
+                                               ' '.join( str( node ) for node in nodeList ) )
+        elif kind == ROW or kind == COLUMN:
+            reason = 'the rest of %s %d' % ( kind, index )
+        else:
+            reason = 'the values the cages need in its rows and columns'
+
+        placements = self.placements()
+        if placements:
+            node, val = placements[0]
+            return '%s must be %d because of %s' % ( node, val, reason )
+
+        node, removed = self.eliminations()[0]
+        return "%s can't be %s because of %s" % ( node, ' or '.join( str( val ) for val in removed ), reason )
@@ -7,9 +7,17 @@
 #                                                                      #
 ########################################################################
 
-import scipy
 import random
 
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Cumulative probabilities of the desired cage lengths:  come back
+#   with 2 and 3 more often than 4, 4 more often than 1, etc.
+DEFAULT_LENGTHS = [ ( .03, 1 ), ( .388125, 2 ), ( .865625, 3 ), ( .985, 4 ), ( .995, 5 ), ( 1., 6 ) ]
+
+
 # ==================================================================== #
 #   A kenken puzzle cage object                                        #
 # ==================================================================== #
@@ -24,12 +32,19 @@ class KenKenCage():
     """
     
     #   Constructor / Destructor  --------------------------------------
-    def __init__( self, N = 6 ):
+    def __init__( self, N = 6, lengthDistribution = DEFAULT_LENGTHS, rng = None ):
         """
         Given the kenken puzzle size, generate a random cage of the
-        N x N nodes
+        N x N nodes.  lengthDistribution is a list of ( cumulative
+        probability, cage length ) pairs (see DEFAULT_LENGTHS).  rng is
+        a random.Random (default the random module itself)
         """
+        if rng is None:
+            rng = random
+        
         self.kenkenSize = N
+        self.lengthDistribution = lengthDistribution
+        self.rng = rng
         self.cageListInit()
     
     
@@ -49,22 +64,69 @@ class KenKenCage():
         """
         Generate a random cage covering of an N x N array.  Return as an
         iterable of integer pairs [ (i,j), (k,l), ... ]
-        """
         
-        N = self.kenkenSize
-        self.cageList = []
+        Nodes are tracked by their flat index i * N + j:
         
-        indexSet = [ (i,j) for i in range( N ) for j in range(N) ]
+            self.labels     flat index : cage label (-1 if still free)
+            self.cages      cage label : list of flat indices
+            self.freeNodes  the free flat indices, in no order, with
+            self.freePos    flat index : position in freeNodes (or -1)
+            self.adjacency  cage label : set of neighboring cage labels
+            self.singles    set of labels of single node cages
+        
+        so that picking, checking, and removing a free node are all O(1)
+        """
         
-        while indexSet != []:
+        N = self.kenkenSize
+        self.labels = [ -1 ] * N * N
+        self.cages = {}
+        self.freeNodes = range( N * N )
+        self.freePos = range( N * N )
+        self.adjacency = {}
+        self.singles = set()
+
+        label = 0
+        while self.freeNodes != []:
             
-            rootIndex = indexSet.pop( random.randrange( len( indexSet ) ) )
+            rootIndex = self.freeNodes[ self.rng.randrange( len( self.freeNodes ) ) ]
+            self.takeNode( rootIndex, label )
             
-            cage = self.growCage( rootIndex, indexSet )
+            self.growCage( label )
             
-            self.cageList.append( cage )
+            label += 1
         
         self.consolidateCageList()
+        
+        self.cageList = [ [ divmod( index, N ) for index in self.cages[ label ] ] \
+                          for label in sorted( self.cages ) ]
+    
+    
+    def takeNode( self, index, label ):
+        """
+        Take a free node and put it in the cage label
+        """
+        pos = self.freePos[ index ]
+        last = self.freeNodes.pop()
+        if last != index:
+            self.freeNodes[ pos ] = last
+            self.freePos[ last ] = pos
+        self.freePos[ index ] = -1
+        
+        self.labels[ index ] = label
+        cage = self.cages.setdefault( label, [] )
+        cage.append( index )
+        
+        if len( cage ) == 1:
+            self.singles.add( label )
+        else:
+            self.singles.discard( label )
+        
+        adjacentLabels = self.adjacency.setdefault( label, set() )
+        for neighborIndex in self.neighbors( index ):
+            otherLabel = self.labels[ neighborIndex ]
+            if otherLabel != -1 and otherLabel != label:
+                adjacentLabels.add( otherLabel )
+                self.adjacency[ otherLabel ].add( label )
     
     
     #   Getters
@@ -75,86 +137,141 @@ class KenKenCage():
         return self.cageList
     
     
-    #   Others
-    def consolidateCageList( self, M = 4 ):
+    def getCageLabel( self, node ):
+        """
+        The label of the cage holding node (i,j)
+        """
+        return self.labels[ node[ 0 ] * self.kenkenSize + node[ 1 ] ]
+    
+    
+    def getCage( self, label ):
+        """
+        The nodes (i,j) of the cage label
+        """
+        return [ divmod( index, self.kenkenSize ) for index in self.cages[ label ] ]
+    
+    
+    def cageSize( self, label ):
+        return len( self.cages[ label ] )
+    
+    
+    def neighborCages( self, label ):
+        """
+        The labels of the cages sharing an edge with the cage label
+        """
+        return self.adjacency[ label ]
+    
+    
+    def numberOfSingles( self ):
+        return len( self.singles )
+    
+    
+    def neighbors( self, index ):
         """
-        Cycle through, combining all but M of the equals sites
+        The flat indices of the nodes above, below, left, and right of
+        index (those that are on the board)
         """
-        def numberOfSingles( cageList ):
-            return scipy.sum( [ 1 for cage in cageList if len(cage) == 1 ] )
+        N = self.kenkenSize
+        a, b = divmod( index, N )
+        neighborList = []
+        if b != N - 1:
+            neighborList.append( index + 1 )
+        if b != 0:
+            neighborList.append( index - 1 )
+        if a != 0:
+            neighborList.append( index - N )
+        if a != N - 1:
+            neighborList.append( index + N )
         
-        while numberOfSingles( self.cageList ) > M:
-            self.consolidateOneSingle()
-
-
-    def consolidateOneSingle( self ):
+        return neighborList
+    
+    
+    #   Others
+    def consolidateCageList( self, M = 4 ):
         """
-        Just get one down -- try to put them with "small" neighbors
+        Cycle through, combining all but M of the equals sites.  Merging
+        a single into a neighbor never makes a new single, so one pass
+        over the singles we started with is enough
         """
-        for cage in self.cageList:
-            if len( cage ) == 1:
+        for label in sorted( self.singles ):
+            if self.numberOfSingles() <= M:
                 break
+            
+            #   (may have been swallowed by an earlier merge)
+            if label in self.singles:
+                self.consolidateOneSingle( label )
+    
+    
+    def consolidateOneSingle( self, label ):
+        """
+        Just get one down -- try to put them with "small" neighbors.
+        Return the label of the merged cage (None if there was nothing
+        to merge with)
+        """
+        neighborLabel = self.smallestNeighborCage( label )
+        if neighborLabel is None:
+            return None
         
-        node = cage[0]
+        return self.mergeCages( label, neighborLabel )
+    
+    
+    def smallestNeighborCage( self, label ):
+        """
+        Find the label of the cage neighboring the cage label which is
+        smallest (None if there isn't one)
+        """
+        neighborLabels = self.adjacency[ label ]
+        if not neighborLabels:
+            return None
         
-        neighborCage = self.smallestNeighborCage( node )
-        self.mergeCages( cage, neighborCage )
-
-
-    def smallestNeighborCage( self, node ):
+        return min( neighborLabels, key = lambda otherLabel: ( len( self.cages[ otherLabel ] ), otherLabel ) )
+    
+    
+    def mergeCages( self, label, neighborLabel ):
         """
-        Find the cage neighboring node which is smallest
+        Combine the two cages, relabelling the nodes of the smaller one
+        and folding its adjacency into the larger.  Return the label of
+        the merged cage
         """
-        neighborCage = [ 0, 0, 0, 0, 0, 0, 0, 0, 0 ]
+        if len( self.cages[ label ] ) > len( self.cages[ neighborLabel ] ):
+            label, neighborLabel = neighborLabel, label
         
-        i, j = node
-        upNode    = i, j + 1
-        downNode  = i, j - 1
-        leftNode  = i - 1, j
-        rightNode = i + 1, j
+        cage = self.cages.pop( label )
+        for index in cage:
+            self.labels[ index ] = neighborLabel
         
-        for cage in self.cageList:
-            if cage != [ node ]:
-                if (upNode in cage) or (downNode in cage) or (leftNode in cage) or (rightNode in cage):
-                    if len( cage ) < len( neighborCage ):
-                        neighborCage = list( cage )
+        self.cages[ neighborLabel ] = sorted( self.cages[ neighborLabel ] + cage )
         
-        return neighborCage
-
-
-    def mergeCages( self, cage, neighborCage ):
-        """
-        pop the two cages listed from the list and combine them
-        """
-        newCage = sorted( cage + neighborCage )
-        self.cageList.remove( cage )
-        self.cageList.remove( neighborCage )
-        self.cageList.append( newCage )
+        self.singles.discard( label )
+        self.singles.discard( neighborLabel )
         
+        adjacentLabels = self.adjacency.pop( label )
+        adjacentLabels.discard( neighborLabel )
+        for otherLabel in adjacentLabels:
+            self.adjacency[ otherLabel ].discard( label )
+            self.adjacency[ otherLabel ].add( neighborLabel )
+        self.adjacency[ neighborLabel ].discard( label )
+        self.adjacency[ neighborLabel ].update( adjacentLabels )
+        
+        return neighborLabel
+
 
-    def growCage( self, rootIndex, indexSet ):
+    def growCage( self, label ):
         """
-        Given a starting index and a list of remaining available indices,
-        try to build a cage of an arbitrary length (let's say we bias our
-        choice with a gaussian distribution centered at 3)
+        Given a cage holding just its starting node, try to build it up
+        to an arbitrary length (let's say we bias our choice with a
+        gaussian distribution centered at 3) out of free neighbors
         """
-        N = self.kenkenSize
         goalLength = self.desiredLength()
+        cage = self.cages[ label ]
         
-        cage = [ rootIndex ]
-        canGrow = True
-        
-        while canGrow and ( len( cage ) < goalLength ):
+        while len( cage ) < goalLength:
             
-            try:
-                neighbor = self.findNeighbor( cage, indexSet )
-                indexSet.remove( neighbor )
-                cage.append(neighbor)
+            neighbor = self.findNeighbor( cage )
+            if neighbor is None:
+                break
             
-            except ValueError:
-                canGrow = False
-        
-        return cage
+            self.takeNode( neighbor, label )
 
 
     def desiredLength( self ):
@@ -162,68 +279,28 @@ class KenKenCage():
         Give the desired number of cells in a cage; come back with 2 and 3
         more often than 4, 4 more often than 1, etc.
         """
-        r = random.random()
-        
-        if r < .03:
-            return 1
+        r = self.rng.random()
         
-        elif r < .388125:
-            return 2
+        for ( probability, length ) in self.lengthDistribution:
+            if r < probability:
+                return length
         
-        elif r < .865625:
-            return 3
-        
-        elif r < .985:
-            return 4
-        
-        elif r < .995:
-            return 5
-        
-        else:
-            return 6
+        return self.lengthDistribution[ -1 ][ 1 ]
 
 
-    def findNeighbor( self, cage, indexSet ):
+    def findNeighbor( self, cage ):
         """
-        Find a random neighbor of some site in cage that is in indexSet
+        Find a random free neighbor of some site in cage, preferring the
+        most recently added sites (None if there isn't one)
         """
-        N = self.kenkenSize
-        
-        UP,DOWN,LEFT,RIGHT = 0,1,2,3
-        directionList = [UP,DOWN,LEFT,RIGHT]
-        
-        i = 0
-        while i < len( cage ):
-            
-            #   Pick an index to grow from
-            growIndex = cage[ -(i + 1) ]
-            a, b = growIndex
-            neighborIndex = -1, -1
+        for growIndex in reversed( cage ):
             
             #   Cycle through directions randomly
-            random.shuffle( directionList )
+            neighborList = self.neighbors( growIndex )
+            self.rng.shuffle( neighborList )
             
-            for dir in directionList:
-                
-                if dir == UP:
-                    if b != N - 1:
-                        neighborIndex = a, b + 1
-                    
-                elif dir == DOWN:
-                    if b != 0:
-                        neighborIndex = a, b - 1
-                    
-                elif dir == LEFT:
-                    if a != 0:
-                        neighborIndex = a - 1, b
-                    
-                else:#dir == RIGHT:
-                    if a != N - 1:
-                        neighborIndex = a + 1, b
-                
-                if ( neighborIndex != (-1,-1) ) and ( neighborIndex in indexSet ):
+            for neighborIndex in neighborList:
+                if self.labels[ neighborIndex ] == -1:
                     return neighborIndex
-            
-            i += 1
         
-        raise ValueError, "Can't grow cage to desired length"
+        return None
@@ -7,6 +7,7 @@
 #                                                                      #
 ########################################################################
 
+import copy
 import scipy
 import random
 
@@ -23,6 +24,84 @@ MINUS = 3
 DIVIDE = 4
 
 
+# ==================================================================== #
+#   Bulk creation                                                      #
+# ==================================================================== #
+
+def randomKenKens( M, N = 6, rng = None ):
+    """
+    Return a list of M random N x N kenken puzzles, drawing all of their
+    solutions at once with LatinSquare.randomLatinSquareBatch.  rng is a
+    numpy RandomState; if given, it determines the puzzles (each one's
+    cages and rules come from a random.Random seeded from it)
+    """
+    if rng is None:
+        return [ KenKen( N, solution ) for solution in LS.randomLatinSquareBatch( M, N ) ]
+    
+    return [ KenKen( N, solution, random.Random( rng.randint( 2**31 - 1 ) ) ) \
+             for solution in LS.randomLatinSquareBatch( M, N, rng = rng ) ]
+
+
+# ==================================================================== #
+#   Rules                                                              #
+# ==================================================================== #
+
+def randomRule( cage, solution, rng = None ):
+    """
+    Create a random rule ( cage, operation, value ) for one cage of the
+    latin square solution.  rng is a random.Random (default the random
+    module itself)
+    """
+    if rng is None:
+        rng = random
+    
+    if len( cage ) == 1:
+        operation = EQUALS
+        value = solution[ cage[0] ]
+    
+    else:
+        
+        if len( cage ) == 2:
+            operation = rng.randint(1,4)
+            values = sorted( [ solution[ index ] for index in cage ] )
+            
+            if operation == PLUS:
+                value = scipy.sum( values )
+            
+            elif operation == MINUS:
+                value = values[1] - values[0]
+            
+            elif operation == TIMES:
+                value = scipy.prod( values )
+            
+            elif operation == DIVIDE:
+                vMin, vMax = values
+                if vMax % vMin == 0:
+                    value = vMax / vMin
+                else:
+                    operation = MINUS
+                    value = vMax - vMin
+            
+            else:
+                raise ValueError, "Operation -- I'm the doctor for you"
+        
+        
+        else:
+            operation = rng.randint( 1, 2 )
+            values = sorted( [ solution[ index ] for index in cage ] )
+            
+            if operation == PLUS:
+                value = scipy.sum( values )
+            
+            elif operation == TIMES:
+                value = scipy.prod( values )
+            
+            else:
+                raise ValueError, "Operation not possible for this list, dog"
+    
+    return (cage, operation, value)
+
+
 # ==================================================================== #
 #   Kenken class object                                                #
 # ==================================================================== #
@@ -38,21 +117,47 @@ class KenKen():
     """
     
     #   Constructor / Destructor  --------------------------------------
-    def __init__( self, N = 6 ):
+    def __init__( self, N = 6, solution = None, rng = None, cages = None, ruleList = None ):
         """
-        Given the kenken puzzle size, generate a random kenken puzzle.
+        Given the kenken puzzle size, generate a random kenken puzzle
+        (with the latin square solution, if given).  Everything random
+        is drawn from rng, a random.Random (default the random module
+        itself), which is kept for any rules made later.  To skip the
+        random generation, give either
+            
+            ruleList    the rules of an existing puzzle, used as they
+                        are (solution may be left as None)
+            cages       a cage list as made by KenKenCage, to draw
+                        random rules for on the given solution
+        
         Variables:
             ruleList
+            cageDic
+            positionDic
             size
             solution
             solvableDic
             displayedNumbers
+            rng
         """
         
         #   Creating a puzzle
+        self.rng = rng
         self.ruleList = []
+        self.cageDic = {}
+        self.positionDic = {}
         self.size = N
-        self.randomKenKenInit()
+        if ruleList is not None:
+            self.solution = solution
+            self.ruleList = list( ruleList )
+            self.indexRules()
+        elif cages is not None:
+            if solution is None:
+                raise ValueError, "Need a solution to make rules for the cages"
+            self.solution = solution
+            self.createRules( cages )
+        else:
+            self.randomKenKenInit( solution )
         
         #   Solving a puzzle
         self.possDic = {}
@@ -62,6 +167,9 @@ class KenKen():
         
         #   Displaying a puzzle
         self.displayedNumbers = {}
+        
+        #   True while the solve state above is shared with a copy
+        self.sharedState = False
     
     
     def __del__( self ):
@@ -73,15 +181,30 @@ class KenKen():
     
     def copy( self ):
         """
-        Make a regular kenken, but then update everything by copying it
+        Make a copy of this kenken without generating anything, in O(1):
+        the rules and their lookups are shared (they are only ever
+        replaced, never changed in place), and so are possDic, solveDic,
+        and displayedNumbers until either kenken changes them, at which
+        point it takes copies of its own (copy on write; see ownState)
         """
-        copyK = KenKen( self.size )
-        copyK.ruleList = self.ruleList
-        copyK.size = self.size
-        copyK.solveDic = self.solveDic
-        copyK.displayedNumbers = self.displayedNumbers
+        copyK = copy.copy( self )
+        self.sharedState = True
+        copyK.sharedState = True
         
         return copyK
+    
+    
+    def ownState( self ):
+        """
+        Make sure the solve state isn't shared with a copy before we
+        change it.  The lists inside are replaced rather than changed,
+        so copying the dictionaries is enough
+        """
+        if self.sharedState:
+            self.possDic = dict( self.possDic )
+            self.solveDic = dict( self.solveDic )
+            self.displayedNumbers = dict( self.displayedNumbers )
+            self.sharedState = False
 
     
     #   Overloaded operators
@@ -89,16 +212,31 @@ class KenKen():
     
     
     #   Setters  -------------------------------------------------------
-    def randomKenKenInit( self ):
+    def randomKenKenInit( self, solution = None ):
         """
-        Create the rules defining this instance of a kenken puzzle
+        Create the rules defining this instance of a kenken puzzle,
+        drawing a random solution unless one is given
         """
-        self.solution = LS.randomLatinSquare( self.size )
-        kenkenCage = KKC.KenKenCage( self.size )
+        if solution is None:
+            solution = LS.randomLatinSquare( self.size, self.rng )
+        self.solution = solution
+        kenkenCage = KKC.KenKenCage( self.size, rng = self.rng )
         cages = kenkenCage.getCageList()
         self.createRules( cages )
     
     
+    def setRules( self, ruleList ):
+        """
+        Replace the rules of this kenken (e.g. after changing some of
+        them), rebuilding the lookups and solveDic
+        """
+        self.ruleList = ruleList
+        self.indexRules()
+        self.ownState()
+        self.solveDic = {}
+        self.solveDicInit()
+    
+    
     def solveDicInit( self ):
         """
         Set up an object which contains nodelist : possval lists
@@ -109,27 +247,28 @@ class KenKen():
     
     def possDicInit( self ):
         """
-        Add 1 - 9 to every dictionary
+        Add 1 - N to every dictionary
         """
-        for i in range( 9 ):
-            for j in range( 9 ):
-                self.possDic[ i, j ] = [ 1, 2, 3, 4, 5, 6, 7, 8, 9 ]
-        
+        N = self.size
+        for i in range( N ):
+            for j in range( N ):
+                self.possDic[ i, j ] = range( 1, N + 1 )
+    
     
     def removePossValue( self, node, value ):
         """
         Remove the value from the possDic for a given node
         """
-        try:
-            self.possDic[ node ].remove( value )
-        except:
-            pass
+        if value in self.possDic.get( node, () ):
+            self.ownState()
+            self.possDic[ node ] = [ val for val in self.possDic[ node ] if val != value ]
     
     
     def addDisplayValue( self, node, value ):
         """
         Add the solved value to the possDic with key node
         """
+        self.ownState()
         self.displayedNumbers[ node ] = value
     
     
@@ -138,6 +277,7 @@ class KenKen():
         given a dictionary of node : list pairs, update the
         self.solveDic
         """
+        self.ownState()
         self.solveDic.update( solveDic )
     
     
@@ -146,6 +286,7 @@ class KenKen():
         given a dictionary of node : list pairs, update the
         self.possDic
         """
+        self.ownState()
         self.possDic.update( possDic )
         
         for (node, nodeList) in possDic.iteritems():
@@ -172,6 +313,20 @@ class KenKen():
         return self.displayedNumbers
     
     
+    def getCage( self, node ):
+        """
+        Return the node list (as a tuple) of the rule containing node
+        """
+        return self.cageDic[ node ]
+    
+    
+    def getCagePosition( self, node ):
+        """
+        Return the index of node within the node list of its rule
+        """
+        return self.positionDic[ node ]
+    
+    
     #   Others  --------------------------------------------------------
     def createRules( self, cages ):
         """
@@ -180,52 +335,32 @@ class KenKen():
         """
         
         for cage in cages:
-            
-            if len( cage ) == 1:
-                operation = EQUALS
-                value = self.solution[ cage[0] ]
-                
-            else:
-                
-                if len( cage ) == 2:
-                    operation = random.randint(1,4)
-                    values = sorted( [ self.solution[ index ] for index in cage ] )
-                    
-                    if operation == PLUS:
-                        value = scipy.sum( values )
-                    
-                    elif operation == MINUS:
-                        value = values[1] - values[0]
-                        
-                    elif operation == TIMES:
-                        value = scipy.prod( values )
-                        
-                    elif operation == DIVIDE:
-                        vMin, vMax = values
-                        if vMax % vMin == 0:
-                            value = vMax / vMin
-                        else:
-                            operation = MINUS
-                            value = vMax - vMin
-                    
-                    else:
-                        raise ValueError, "Operation -- I'm the doctor for you"
-                        
-                
-                else:
-                    operation = random.randint( 1, 2 )
-                    values = sorted( [ self.solution[ index ] for index in cage ] )
-                        
-                    if operation == PLUS:
-                        value = scipy.sum( values )
-                    
-                    elif operation == TIMES:
-                        value = scipy.prod( values )
-                    
-                    else:
-                        raise ValueError, "Operation not possible for this list, dog"
-                
-            self.ruleList.append( (cage, operation, value) )
+            self.ruleList.append( self.createRule( cage ) )
+        
+        self.indexRules()
+    
+    
+    def createRule( self, cage ):
+        """
+        Create a random rule ( cage, operation, value ) for one cage of
+        the latin square given by self.solution
+        """
+        return randomRule( cage, self.solution, self.rng )
+    
+    
+    def indexRules( self ):
+        """
+        Build the node : rule node tuple and node : position in that
+        tuple lookups for the current ruleList
+        """
+        self.cageDic = {}
+        self.positionDic = {}
+        
+        for rule in self.ruleList:
+            nodeList = tuple( rule[0] )
+            for (i, node) in enumerate( nodeList ):
+                self.cageDic[ node ] = nodeList
+                self.positionDic[ node ] = i
     
     
     def isSolved( self ):
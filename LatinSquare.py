@@ -7,15 +7,82 @@
 #                                                                      #
 ########################################################################
 
+import numpy
 import scipy
 import random
 
-def randomLatinSquare( N = 6 ):
+def randomLatinSquare( N = 6, rng = None ):
     """
-    Return a randomized latin square of dimensions N x N
+    Return a randomized latin square of dimensions N x N.  rng is a
+    random.Random (default the random module itself)
     """
-    return notSoRandom()
-    #return bruteForceLatinSquare( N )
+    return jacobsonMatthewsLatinSquare( N, rng = rng )
+
+
+def randomLatinSquareBatch( M, N = 6, numBase = None, validate = False, rng = None ):
+    """
+    Return an M x N x N integer array of random latin squares.  A few
+    (numBase, default up to 16) Jacobson - Matthews squares are drawn as
+    seeds, and every square of the batch is one of them put through a
+    random conjugate (a permutation of the roles of row, column, and
+    symbol) and random row, column, and symbol permutations -- all done
+    with array operations over the whole batch.  If validate is True,
+    check the batch with validateLatinSquareBatch (ValueError if any
+    square fails).  rng is a numpy RandomState (default numpy.random);
+    the seed squares come from a random.Random seeded from it, so rng
+    alone determines the batch
+    """
+    if rng is None:
+        rng = numpy.random
+    
+    if numBase is None:
+        numBase = max( 1, min( M, 16 ) )
+    
+    #   Seed squares, with symbols 0 - N-1
+    baseRng = random.Random( rng.randint( 2**31 - 1 ) )
+    base = numpy.array( [ jacobsonMatthewsLatinSquare( N, rng = baseRng ) - 1 for b in range( numBase ) ] )
+    squares = base[ rng.randint( numBase, size = M ) ]
+    
+    m = numpy.arange( M )[ :, None, None ]
+    
+    #   Conjugates:  every ( row, column, symbol ) triple of a square is
+    #   shuffled by the same random permutation of its three roles
+    rows, columns = numpy.indices( ( N, N ) )
+    triples = numpy.array( [ numpy.broadcast_to( rows, ( M, N, N ) ),
+                             numpy.broadcast_to( columns, ( M, N, N ) ),
+                             squares ] )
+    roles = numpy.argsort( rng.random_sample( ( M, 3 ) ), axis = 1 )
+    a = triples[ roles[ :, 0 ], numpy.arange( M ) ]
+    b = triples[ roles[ :, 1 ], numpy.arange( M ) ]
+    c = triples[ roles[ :, 2 ], numpy.arange( M ) ]
+    squares = numpy.empty( ( M, N, N ), dtype = int )
+    squares[ m, a, b ] = c
+    
+    #   Row, column, and symbol permutations
+    rowPerms = numpy.argsort( rng.random_sample( ( M, N ) ), axis = 1 )
+    columnPerms = numpy.argsort( rng.random_sample( ( M, N ) ), axis = 1 )
+    symbolPerms = numpy.argsort( rng.random_sample( ( M, N ) ), axis = 1 )
+    
+    squares = squares[ m, rowPerms[ :, :, None ], columnPerms[ :, None, : ] ]
+    squares = symbolPerms[ m, squares ] + 1
+    
+    if validate and not validateLatinSquareBatch( squares ).all():
+        raise ValueError, "Latin square batch failed validation"
+    
+    return squares
+
+
+def validateLatinSquareBatch( squares ):
+    """
+    Given an M x N x N array, return a length M boolean array which is
+    True where the square is latin (every row and column holds 1 - N)
+    """
+    M, N = squares.shape[ 0 ], squares.shape[ 1 ]
+    values = numpy.arange( 1, N + 1 )
+    rowsOk = ( numpy.sort( squares, axis = 2 ) == values ).all( axis = ( 1, 2 ) )
+    columnsOk = ( numpy.sort( squares, axis = 1 ) == values[ :, None ] ).all( axis = ( 1, 2 ) )
+    
+    return rowsOk & columnsOk
 
 
 def notSoRandom():
@@ -36,26 +103,103 @@ def notSoRandom():
     return a
     
 
-def bruteForceLatinSquare( N = 6 ):
+def jacobsonMatthewsLatinSquare( N = 6, iterations = None, rng = None ):
     """
-    A brute force means of calculating a random square of size N x N
+    A random square of size N x N from the Jacobson - Matthews Markov
+    chain.  The square is kept as an N x N x N "incidence cube" with
+    cube[ x, y, z ] = 1 if symbol z sits at row x, column y.  Each move
+    adds and subtracts 1 around the corners of a little sub-cube, which
+    keeps every line of the cube summing to 1; a move may leave a single
+    -1 behind (an "improper" square), in which case the next move has to
+    start from that cell.  Every step takes O(N) time and the chain can
+    never get stuck, so after iterations (default N^3) moves we just
+    keep going until the square is proper again.  rng is a
+    random.Random (default the random module itself)
     """
-    a = scipy.zeros( (N,N) )
-    intList = range( 1, N + 1 )
+    if rng is None:
+        rng = random
     
-    for i in range( N ):
-        for j in range( N ):
-            
-            random.shuffle( intList )
-            ind = 0
+    if iterations is None:
+        iterations = N ** 3
+    
+    #   (a 1 x 1 cube has no empty cell to move from)
+    if N == 1:
+        iterations = 0
+    
+    #   Flattened cube, starting from the cyclic square
+    cube = [ 0 ] * N ** 3
+    def index( x, y, z ):
+        return ( x * N + y ) * N + z
+    
+    for x in range( N ):
+        for y in range( N ):
+            cube[ index( x, y, ( x + y ) % N ) ] = 1
+    
+    def ones( x, y, z, axis ):
+        """
+        The coordinates along axis (0 = x, 1 = y, 2 = z) through
+        ( x, y, z ) at which the cube holds a 1
+        """
+        if axis == 0:
+            return [ a for a in range( N ) if cube[ index( a, y, z ) ] == 1 ]
+        elif axis == 1:
+            return [ a for a in range( N ) if cube[ index( x, a, z ) ] == 1 ]
+        else:
+            return [ a for a in range( N ) if cube[ index( x, y, a ) ] == 1 ]
+    
+    improper = None
+    step = 0
+    while step < iterations or improper is not None:
+        
+        if improper is None:
+            #   Start from any empty cell; its lines each hold one 1
+            x, y, z = rng.randrange( N ), rng.randrange( N ), rng.randrange( N )
+            while cube[ index( x, y, z ) ] != 0:
+                x, y, z = rng.randrange( N ), rng.randrange( N ), rng.randrange( N )
             
-            while a[i,j] == 0:
-                randInt = intList[ ind ]
-                
-                if randInt not in a[i,:j] and randInt not in a[:i,j]:
-                    a[i,j] = randInt
-                    
-                else:
-                    ind += 1
+            x1 = ones( x, y, z, 0 )[0]
+            y1 = ones( x, y, z, 1 )[0]
+            z1 = ones( x, y, z, 2 )[0]
+        
+        else:
+            #   Start from the -1; its lines each hold two 1s
+            x, y, z = improper
+            x1 = rng.choice( ones( x, y, z, 0 ) )
+            y1 = rng.choice( ones( x, y, z, 1 ) )
+            z1 = rng.choice( ones( x, y, z, 2 ) )
+        
+        cube[ index( x,  y,  z  ) ] += 1
+        cube[ index( x,  y1, z1 ) ] += 1
+        cube[ index( x1, y,  z1 ) ] += 1
+        cube[ index( x1, y1, z  ) ] += 1
+        cube[ index( x,  y,  z1 ) ] -= 1
+        cube[ index( x,  y1, z  ) ] -= 1
+        cube[ index( x1, y,  z  ) ] -= 1
+        cube[ index( x1, y1, z1 ) ] -= 1
+        
+        if cube[ index( x1, y1, z1 ) ] == -1:
+            improper = x1, y1, z1
+        else:
+            improper = None
+        
+        step += 1
+    
+    a = scipy.zeros( ( N, N ), dtype = int )
+    for x in range( N ):
+        for y in range( N ):
+            a[ x, y ] = ones( x, y, 0, 2 )[0] + 1
     
     return a
+
+
+def isLatinSquare( a ):
+    """
+    Does every row and column of the N x N array a hold 1 - N?
+    """
+    N = len( a )
+    values = range( 1, N + 1 )
+    for i in range( N ):
+        if sorted( a[ i, : ] ) != values or sorted( a[ :, i ] ) != values:
+            return False
+    
+    return True
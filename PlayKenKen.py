@@ -0,0 +1,200 @@
+########################################################################
+#                                                                      #
+#   PlayKenKen.py                                                      #
+#       Created: Feb 17, 2013                                          #
+#                                                                      #
+#       A module for keeping track of a ken ken problem while someone  #
+#       plays it, one entered or erased number at a time               #
+#                                                                      #
+########################################################################
+
+import time
+
+import HintKenKen as HKK
+import SolveKenKen as SKK
+from SolveKenKen import listFromMask
+
+
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Seconds isSolvable may spend searching before giving up
+SOLVABLE_TIME_LIMIT = .05
+
+
+# ==================================================================== #
+#   Play session                                                       #
+# ==================================================================== #
+
+class PlaySession():
+    """
+    The state of a kenken being played.  One KenKenSolver is propagated
+    once when the session starts, and every number entered after that
+    is applied to it as a narrowing of that one node, so propagation
+    only revisits the rules, rows, and columns it touches (see
+    KenKenSolver.narrowNode).  The solver state from before each entry
+    is kept, so erasing the last entry is just a restore; erasing an
+    earlier one restores to before it and re-applies the ones after
+    """
+
+    #   Constructor / Destructor  --------------------------------------
+    def __init__( self, k, maxSubsetSize = None ):
+        """
+        Given the kenken object, set up the solver for a fresh board
+        """
+        self.k = k
+        self.size = k.size
+        self.solver = SKK.KenKenSolver( k, maxSubsetSize = maxSubsetSize )
+        self.consistent = self.solver.propagate()
+
+        #   The entries in the order they were made, and the solver
+        #   state ( saveState(), consistent ) from just before each
+        self.entries = []
+        self.states = []
+
+        #   The solver hints are walked on with, made on the first hint
+        #   after the entries last changed
+        self.hintSolver = None
+
+        self.solution = k.solution
+
+
+    def __del__( self ):
+        """
+        Deallocate anything that needs to be
+        """
+        pass
+
+
+    #   Entering numbers  ----------------------------------------------
+    def apply( self, node, value ):
+        """
+        Enter value at node (replacing anything already there), and
+        return False if the board can now be seen to have no solution
+        """
+        if self.entryIndex( node ) is not None:
+            self.retract( node )
+
+        self.states.append( ( self.solver.saveState(), self.consistent ) )
+        self.entries.append( ( node, value ) )
+        self.hintSolver = None
+
+        if self.consistent:
+            self.solver.narrowNode( node, 1 << value )
+            self.consistent = self.solver.propagate()
+
+        return self.consistent
+
+
+    def retract( self, node ):
+        """
+        Erase the number entered at node (if any), and return whether
+        the board is consistent again
+        """
+        p = self.entryIndex( node )
+        if p is None:
+            return self.consistent
+
+        state, consistent = self.states[p]
+        self.solver.restoreState( state )
+        self.consistent = consistent
+        self.hintSolver = None
+
+        replay = self.entries[ p + 1 : ]
+        del self.entries[ p : ]
+        del self.states[ p : ]
+
+        for ( otherNode, value ) in replay:
+            self.apply( otherNode, value )
+
+        return self.consistent
+
+
+    def entryIndex( self, node ):
+        for ( p, ( otherNode, value ) ) in enumerate( self.entries ):
+            if otherNode == node:
+                return p
+
+        return None
+
+
+    #   Questions about the board  -------------------------------------
+    def getEntries( self ):
+        """
+        node : value for every number entered
+        """
+        return dict( self.entries )
+
+
+    def candidates( self, node ):
+        """
+        The values still allowed at node
+        """
+        return listFromMask( self.solver.possDic[ node ] )
+
+
+    def isSolvable( self, timeLimit = SOLVABLE_TIME_LIMIT ):
+        """
+        Can the board still be completed?  True or False, or None if
+        searching took longer than timeLimit seconds to tell
+        """
+        if not self.consistent:
+            return False
+        if self.solver.solved:
+            return self.solver.validSolution()
+
+        state = self.solver.saveState()
+        self.solver.deadline = time.time() + timeLimit
+        try:
+            return self.solver.search()
+
+        except SKK.SolveTimeout:
+            return None
+
+        finally:
+            self.solver.deadline = None
+            self.solver.restoreState( state )
+
+
+    def hint( self, timeLimit = HKK.HINT_TIME_LIMIT ):
+        """
+        The next step from the numbers entered so far (see
+        HintKenKen.nextHint).  The session's own solver has already
+        propagated past anything a hint could say, so hints come from a
+        second solver that starts from the bare board and the entries.
+        Each hint given is applied to it, so asking again gives the step
+        after; entering or erasing a number starts it over
+        """
+        if self.hintSolver is None:
+            self.hintSolver = HKK.hintSolver( self.k, self.getEntries() )
+
+        return HKK.nextHint( self.hintSolver, timeLimit, apply = True )
+    
+    
+    def wrongCells( self ):
+        """
+        The nodes whose entries don't match the solution of the kenken
+        (solved for the first time this is called, if the kenken object
+        didn't come with one)
+        """
+        if self.solution is None:
+            result = SKK.solve( self.k )
+            if not result.isSolved():
+                return []
+            self.solution = result.grid
+
+        return sorted( node for ( node, value ) in self.entries if self.solution[ node ] != value )
+
+
+    def conflicts( self ):
+        """
+        The nodes whose entries repeat the entry of another node in the
+        same row or column
+        """
+        seen = {}
+        for ( ( i, j ), value ) in self.entries:
+            seen.setdefault( ( 0, i, value ), [] ).append( (i,j) )
+            seen.setdefault( ( 1, j, value ), [] ).append( (i,j) )
+
+        return sorted( set( node for nodes in seen.itervalues() if len( nodes ) > 1 for node in nodes ) )
@@ -7,34 +7,264 @@
 #                                                                      #
 ########################################################################
 
-import copy
+import json
+import time
+import numpy
 import scipy
 import itertools
+import collections
 
 import KenKenClass as K
-import DisplayKenKen as DKK
+import CageCombinations as CC
 from KenKenClass import EQUALS, PLUS, TIMES, MINUS, DIVIDE
 
 
+# ==================================================================== #
+#   Module Constants                                                   #
+# ==================================================================== #
+
+#   Outcomes of a solve
+SOLVED = 'solved'
+UNSOLVED = 'unsolved'
+CONTRADICTION = 'contradiction'
+TIMEOUT = 'timeout'
+
+#   Techniques, for counting eliminations
+CLEAN_SINGLES = 'cleanSingles'
+PARE_VALUES = 'pareValues'
+SUB_GROUPS = 'subGroups'
+NECESSARY_RULE_VALUES = 'necessaryRuleValues'
+SEARCH = 'search'
+TECHNIQUES = [ CLEAN_SINGLES, PARE_VALUES, SUB_GROUPS, NECESSARY_RULE_VALUES, SEARCH ]
+
+#   Difficulty grades are named for the hardest technique a puzzle
+#   needs, and run from easiest to hardest in the order of TECHNIQUES
+GRADES = TECHNIQUES
+
+
+# ==================================================================== #
+#   Headless solving                                                   #
+# ==================================================================== #
+
+def solve( k, useSearch = True, maxSubsetSize = None, timeLimit = None, instrument = False ):
+    """
+    Solve the kenken object k without printing, prompting, or touching
+    k itself, and return a SolveResult.  If timeLimit (seconds) runs out
+    first the status is TIMEOUT.  With instrument, the result carries
+    a SolverStats
+    """
+    solver = KenKenSolver( k, maxSubsetSize = maxSubsetSize, instrument = instrument )
+    return solver.solve( useSearch, timeLimit = timeLimit )
+
+
+def findSolutions( k, limit = 2, maxSubsetSize = None, timeLimit = None ):
+    """
+    Return a list of up to limit solution grids of the kenken object k,
+    stopping the search as soon as limit have been found (so the
+    default answers "is the solution unique?" without finding them
+    all).  Raises SolveTimeout if timeLimit (seconds) runs out first
+    """
+    solver = KenKenSolver( k, maxSubsetSize = maxSubsetSize )
+    return solver.findSolutions( limit, timeLimit )
+
+
+def grade( k, maxGrade = SEARCH, maxSubsetSize = None, timeLimit = None ):
+    """
+    Return the difficulty grade of the kenken object k:  the hardest
+    technique (see GRADES) needed to solve it.  Gives up and returns
+    None as soon as it is clear that k is harder than maxGrade, or
+    CONTRADICTION if k has no solution.  Raises SolveTimeout if
+    timeLimit (seconds) runs out first
+    """
+    solver = KenKenSolver( k, maxSubsetSize = maxSubsetSize, techniques = [] )
+    return solver.grade( maxGrade, timeLimit )
+
+
+class SolveTimeout( Exception ):
+    """
+    Raised inside the solver when its time limit runs out
+    """
+    pass
+
+
+class SolveResult():
+    """
+    The outcome of a solve:
+    
+        status          SOLVED, UNSOLVED (propagation stalled and no
+                        search), CONTRADICTION (no solution), or
+                        TIMEOUT
+        grid            N x N array of solved values, 0 where unsolved
+        iterations      propagation rounds (across all search branches)
+        branches        guesses made by the search
+        eliminations    technique : number of candidate values removed
+        wallTime        seconds
+        stats           SolverStats, if the solver was instrumented
+    """
+    
+    def __init__( self, status, grid, iterations, branches, eliminations, wallTime, stats = None ):
+        self.status = status
+        self.grid = grid
+        self.iterations = iterations
+        self.branches = branches
+        self.eliminations = eliminations
+        self.wallTime = wallTime
+        self.stats = stats
+
+    
+    def __repr__( self ):
+        return 'SolveResult( %s, %d iterations, %d branches, %.4fs )' % \
+               ( self.status, self.iterations, self.branches, self.wallTime )
+    
+    
+    def isSolved( self ):
+        return self.status == SOLVED
+    
+    
+    def asDict( self ):
+        """
+        Plain python types only, e.g. for json
+        """
+        resultDic = { 'status'       : self.status,
+                      'grid'         : self.grid.tolist(),
+                      'iterations'   : self.iterations,
+                      'branches'     : self.branches,
+                      'eliminations' : dict( self.eliminations ),
+                      'wallTime'     : self.wallTime }
+        
+        if self.stats is not None:
+            resultDic[ 'stats' ] = self.stats.asDict()
+        
+        return resultDic
+
+
+class SolverStats():
+    """
+    Per-technique instrumentation of a solve (see the instrument option
+    of KenKenSolver):
+        
+        time            technique : seconds spent in it
+        runs            technique : number of times it was run (rules
+                        pared, rows / columns reduced, guesses, ...)
+        eliminations    technique : number of candidate values removed
+        cycles          propagation rounds
+        branches        guesses made by the search
+        peakTupleCount  the most rule tuples held in solveDic at once
+    """
+    
+    def __init__( self ):
+        self.time = dict( ( technique, 0. ) for technique in TECHNIQUES )
+        self.runs = dict( ( technique, 0 ) for technique in TECHNIQUES )
+        self.eliminations = dict( ( technique, 0 ) for technique in TECHNIQUES )
+        self.cycles = 0
+        self.branches = 0
+        self.tupleCount = 0
+        self.peakTupleCount = 0
+    
+    
+    def addRun( self, technique, seconds ):
+        self.time[ technique ] += seconds
+        self.runs[ technique ] += 1
+    
+    
+    def changeTupleCount( self, change ):
+        self.tupleCount += change
+        if self.tupleCount > self.peakTupleCount:
+            self.peakTupleCount = self.tupleCount
+    
+    
+    def resetTupleCount( self, solveDic ):
+        self.tupleCount = 0
+        self.changeTupleCount( sum( len( solveSet ) for solveSet in solveDic.itervalues() ) )
+    
+    
+    def finish( self, solver ):
+        """
+        Pick up the counters the solver keeps anyway
+        """
+        self.eliminations = dict( solver.eliminations )
+        self.cycles = solver.iterations
+        self.branches = solver.branches
+    
+    
+    def asDict( self ):
+        return { 'time'           : dict( self.time ),
+                 'runs'           : dict( self.runs ),
+                 'eliminations'   : dict( self.eliminations ),
+                 'cycles'         : self.cycles,
+                 'branches'       : self.branches,
+                 'peakTupleCount' : self.peakTupleCount }
+    
+    
+    def toJson( self ):
+        return json.dumps( self.asDict(), sort_keys = True )
+
+
+# ==================================================================== #
+#   Solver object                                                      #
+# ==================================================================== #
+
+
 class KenKenSolver():
     """
     An object to hold a local copy of the rule list and solve dictionary
     """
     
     #   Constructor / Destructor  --------------------------------------
-    def __init__( self, k, showOnFly = False ):
+    def __init__( self, k, showOnFly = False, maxSubsetSize = None, instrument = False,
+                  techniques = None ):
         """
-        Given the kenken object, generate a solver object
+        Given the kenken object, generate a solver object.  maxSubsetSize
+        caps the size of the naked / hidden subsets looked for in rows
+        and columns (None looks for all of them).  If instrument is True
+        time and work per technique are tracked in self.stats (otherwise
+        self.stats is None and costs nothing).  techniques limits the
+        solver to some of TECHNIQUES (None allows all of them); givens
+        and singles in rows and columns are always used
         """
         self.k = k
         self.size = k.size
         self.ruleList = list( k.ruleList )
-        self.possDic = copy.deepcopy( k.possDic )
-        self.solveDic = copy.deepcopy( k.solveDic )
+        self.possDic = self.possDicToMasks( k.possDic )
+        #   (the solveDic arrays are only ever replaced, never changed)
+        self.solveDic = dict( ( nodeList, tupleArray( solveSet, len( nodeList ) ) ) \
+                              for ( nodeList, solveSet ) in k.solveDic.iteritems() )
         self.solved = False
+        self.maxSubsetSize = maxSubsetSize
+        
+        if techniques is None:
+            techniques = TECHNIQUES
+        self.techniques = set( techniques )
+
+        #   Bookkeeping for SolveResult
+        self.iterations = 0
+        self.branches = 0
+        self.technique = CLEAN_SINGLES
+        self.eliminations = dict( ( technique, 0 ) for technique in TECHNIQUES )
+        self.deadline = None
+        
+        self.stats = None
+        if instrument:
+            self.stats = SolverStats()
+            self.stats.resetTupleCount( self.solveDic )
+        
+        #   node : rule node tuple and node : position lookups
+        self.cageDic = k.cageDic
+        self.positionDic = k.positionDic
+        
+        #   Propagation work lists.  Whenever a node's allowed values
+        #   shrink, the rule, row, and column containing it are queued
+        #   for another look (see narrowNode)
+        self.ruleQueue = collections.deque()
+        self.lineQueue = collections.deque()
+        self.queued = set()
+        self.contradicted = False
+        self.queueEverything()
         
         self.showOnFly = showOnFly
         if self.showOnFly == True:
+            #   (only drag in pygame if we are actually drawing)
+            import DisplayKenKen as DKK
             self.copyK = k.copy()
             self.displayK = DKK.KenKenDisplay( self.copyK )
     
@@ -47,49 +277,424 @@ class KenKenSolver():
     
     
     #   Major solver routines  -----------------------------------------
-    def solveKenKen( self, shouldPrint = False ):
+    def solveKenKen( self, shouldPrint = False, useSearch = True ):
         """
         Given a kenken object k (primarily the rules and solveDic) try to
         figure out the solution (which is also contained in the kenken
-        object, for what it's worth)
+        object, for what it's worth).  If the propagation passes stop
+        making progress and useSearch is True, fall back on a
+        backtracking search.  The solve state is copied back into k
         """
         
         def updatePrint( string ):
             if shouldPrint == True:
                 print string
         
+        result = self.solve( useSearch, updatePrint )
+        
+        self.k.updateSolveDic( self.solveDicAsLists() )
+        self.k.updatePossDic( self.possDicAsLists() )
+        
+        if result.status == SOLVED:
+            print '\n\n\t\tSOLVED!'
+        elif result.status == CONTRADICTION:
+            print '\n\n\t\tNO SOLUTION!'
+        else:
+            print '\n\n\t\tNot solved (no change this cycle)'
+        
+        return result
+    
+    
+    def solve( self, useSearch = True, updatePrint = None, timeLimit = None ):
+        """
+        Propagate, then search if need be (and allowed), and return a
+        SolveResult.  Never prints (unless given an updatePrint) or
+        prompts.  Gives up with status TIMEOUT after timeLimit seconds
+        """
+        startTime = time.time()
+        if timeLimit is not None:
+            self.deadline = startTime + timeLimit
+        
+        useSearch = useSearch and SEARCH in self.techniques
+        
+        try:
+            consistent = self.propagate( updatePrint )
+            
+            if consistent and not self.solved and useSearch:
+                if updatePrint is not None:
+                    updatePrint( "Searching" )
+                consistent = self.search()
+            
+            if consistent and self.solved and self.validSolution():
+                status = SOLVED
+            elif consistent and not self.solved and not useSearch:
+                status = UNSOLVED
+            else:
+                status = CONTRADICTION
+        
+        except SolveTimeout:
+            status = TIMEOUT
+        
+        finally:
+            self.deadline = None
+        
+        if self.stats is not None:
+            self.stats.finish( self )
+        
+        return SolveResult( status, self.grid(), self.iterations, self.branches, \
+                            self.eliminations, time.time() - startTime, self.stats )
+    
+    
+    def propagate( self, updatePrint = None ):
+        """
+        Run the propagation passes until the kenken is solved or there
+        is nothing left to look at:  rules, rows, and columns are only
+        re-examined when one of their nodes has changed, and the global
+        necessaryRuleValues pass is run whenever the work lists empty.
+        Return False if the current state is contradictory (some node
+        has no allowed values left)
+        """
+        if updatePrint is None:
+            updatePrint = lambda string : None
+        
+        updatePrint( "Cleaning Singles" )
+        self.technique = CLEAN_SINGLES
+        self.timed( self.cleanSingles )
+
         self.kenkenSolved()
-        exit = 'n'
-        while not self.solved and exit != 'y' and exit != '':
+        while not self.solved and not self.contradicted:
             
-            solveDicSizeBefore = scipy.sum( [ len( self.solveDic[ key ] ) for key in self.solveDic ] )
+            self.iterations += 1
             
-            updatePrint( "Cleaning Singles" )
-            self.cleanSingles()
+            updatePrint( "Paring Values and checking subgroups" )
+            while ( self.ruleQueue or self.lineQueue ) and not self.contradicted:
+                self.processUnit()
+                self.checkDeadline()
             
-            updatePrint( "Paring Values" )
-            self.pareValues()
+            if self.showOnFly == True:
+                self.updateAndDisplay()
             
-            #self.singleValueInRules()
+            self.kenkenSolved()
+            if self.solved or self.contradicted:
+                break
             
-            updatePrint( "Checking subgroups" )
-            self.subGroups()
+            if NECESSARY_RULE_VALUES not in self.techniques:
+                break
             
             updatePrint( "Checking necessary values" )
-            self.necessaryRuleValues()
+            self.technique = NECESSARY_RULE_VALUES
+            self.timed( self.necessaryRuleValues )
             
-            self.kenkenSolved()
+            if not ( self.ruleQueue or self.lineQueue ):
+                break
+        
+        return not self.contradicted
+    
+    
+    def processUnit( self ):
+        """
+        Take the next rule, row, or column off of the work lists and
+        re-examine it.  Rules are cheap, so they go first.  Rules are
+        skipped unless PARE_VALUES is allowed (enableTechnique queues
+        them up again)
+        """
+        if self.ruleQueue:
+            unit = self.ruleQueue.popleft()
+        else:
+            unit = self.lineQueue.popleft()
+        self.queued.discard( unit )
+        
+        kind, index = unit
+        if kind == RULE:
+            #   (equals rules are dropped by cleanSingles once applied)
+            self.technique = PARE_VALUES
+            if index in self.ruleDic and PARE_VALUES in self.techniques:
+                self.timed( self.pareRule, self.ruleDic[ index ] )
+        elif kind == ROW:
+            self.technique = SUB_GROUPS
+            self.timed( self.reduceRow, index )
+        else:#kind == COLUMN:
+            self.technique = SUB_GROUPS
+            self.timed( self.reduceColumn, index )
+    
+    
+    def enableTechnique( self, technique ):
+        """
+        Allow technique from now on, and queue everything up for
+        another look with it
+        """
+        self.techniques.add( technique )
+        self.queueEverything()
+    
+    
+    def checkDeadline( self ):
+        """
+        Raise SolveTimeout if we are past the deadline (if any).  Called
+        between units, and inside the ones which can run long on big
+        cages
+        """
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SolveTimeout
+    
+    
+    def timed( self, technique, *args ):
+        """
+        Run technique( *args ), charging its time to self.technique if
+        we are instrumenting
+        """
+        if self.stats is None:
+            return technique( *args )
+        
+        startTime = time.time()
+        try:
+            return technique( *args )
+        finally:
+            self.stats.addRun( self.technique, time.time() - startTime )
+
+    
+    def queueUnit( self, unit ):
+        """
+        Add a ( kind, index ) unit to the appropriate work list, unless
+        it is already waiting there
+        """
+        if unit not in self.queued:
+            self.queued.add( unit )
+            if unit[0] == RULE:
+                self.ruleQueue.append( unit )
+            else:
+                self.lineQueue.append( unit )
+    
+    
+    def queueNode( self, node, solved ):
+        """
+        The allowed values of node have changed:  queue up its rule, row,
+        and column.  If node is now solved, the rules of the other nodes
+        in its row and column must also be re-pared, as their tuples may
+        no longer use that value
+        """
+        i, j = node
+        nodeList = self.cageDic[ node ]
+        if nodeList in self.ruleDic:
+            self.queueUnit( ( RULE, nodeList ) )
+        self.queueUnit( ( ROW, j ) )
+        self.queueUnit( ( COLUMN, i ) )
+        
+        if solved:
+            for a in range( self.size ):
+                for peer in ( ( i, a ), ( a, j ) ):
+                    nodeList = self.cageDic[ peer ]
+                    if nodeList in self.ruleDic:
+                        self.queueUnit( ( RULE, nodeList ) )
+    
+    
+    def queueEverything( self ):
+        """
+        Queue every rule, row, and column
+        """
+        self.ruleDic = dict( ( tuple( rule[0] ), rule ) for rule in self.ruleList )
+        for nodeList in self.ruleDic:
+            self.queueUnit( ( RULE, nodeList ) )
+        for i in range( self.size ):
+            self.queueUnit( ( ROW, i ) )
+            self.queueUnit( ( COLUMN, i ) )
+    
+    
+    def search( self ):
+        """
+        Backtracking search.  Propagate, and if that stalls branch on
+        the node or rule with the fewest remaining options (minimum
+        remaining values), propagating again after each guess and
+        backing out of guesses that lead to a contradiction.  Return
+        True (with the solver state holding the solution) if a solution
+        was found
+        """
+        if not self.propagate():
+            return False
+        
+        if self.solved:
+            return self.validSolution()
+        
+        for choice in self.branchChoices():
+            state = self.saveState()
+            self.technique = SEARCH
+            self.timed( self.applyChoice, choice )
+
+            if self.search():
+                return True
+            
+            self.restoreState( state )
+        
+        return False
+    
+    
+    def grade( self, maxGrade = SEARCH, timeLimit = None ):
+        """
+        Solve using the techniques one at a time, from easiest to
+        hardest (see GRADES), only allowing the next one once the ones
+        allowed so far stall.  Return the technique in use when the
+        kenken was solved, None as soon as it would take a technique
+        harder than maxGrade, or CONTRADICTION if there is no solution.
+        Propagation is never undone, so this costs about one solve
+        """
+        if timeLimit is not None:
+            self.deadline = time.time() + timeLimit
+        
+        try:
+            for technique in GRADES:
+                self.enableTechnique( technique )
+                
+                if technique == SEARCH:
+                    consistent = self.search()
+                else:
+                    consistent = self.propagate()
+                
+                if not consistent:
+                    return CONTRADICTION
+                if self.solved:
+                    if self.validSolution():
+                        return technique
+                    return CONTRADICTION
+                if technique == maxGrade:
+                    return None
+        
+        finally:
+            self.deadline = None
+        
+        return CONTRADICTION
+    
+    
+    def findSolutions( self, limit = 2, timeLimit = None ):
+        """
+        Search every branch (instead of stopping at the first solution)
+        and return a list of up to limit solution grids
+        """
+        if timeLimit is not None:
+            self.deadline = time.time() + timeLimit
+        
+        solutions = []
+        try:
+            self.searchAll( solutions, limit )
+        finally:
+            self.deadline = None
+        
+        return solutions
+    
+    
+    def searchAll( self, solutions, limit ):
+        """
+        Backtracking search as in search, but collecting the grid of
+        every solution found into solutions until there are limit of
+        them.  The guesses at each branch are disjoint, so no solution
+        is found twice
+        """
+        if not self.propagate():
+            return
+        
+        if self.solved:
+            if self.validSolution():
+                solutions.append( self.grid() )
+            return
+        
+        for choice in self.branchChoices():
+            state = self.saveState()
+            self.technique = SEARCH
+            self.timed( self.applyChoice, choice )
             
-            solveDicSizeAfter = scipy.sum( [ len( self.solveDic[ key ] ) for key in self.solveDic ] )
+            self.searchAll( solutions, limit )
             
-            if solveDicSizeBefore == solveDicSizeAfter:
-                print '\n\n\t\tNo Change This Cycle!'
-                exit = raw_input( 'Exit? [y/n] ' )
+            self.restoreState( state )
+            if len( solutions ) >= limit:
+                return
+    
+    
+    def branchChoices( self ):
+        """
+        Find the unsolved node with the fewest allowed values and the
+        unsolved rule with the fewest allowed tuples, and return the
+        list of guesses for whichever has fewer options.  Each guess is
+        a list of ( node, value ) pairs
+        """
+        bestNode, bestNodeCount = None, None
+        for ( node, mask ) in self.possDic.iteritems():
+            count = popCount( mask )
+            if count > 1 and ( bestNodeCount is None or count < bestNodeCount ):
+                bestNode, bestNodeCount = node, count
+        
+        bestRule, bestRuleCount = None, None
+        for rule in self.ruleList:
+            nodeList = tuple( rule[0] )
+            count = len( self.solveDic[ nodeList ] )
+            if count > 1 and ( bestRuleCount is None or count < bestRuleCount ):
+                bestRule, bestRuleCount = nodeList, count
+        
+        if bestRule is not None and ( bestNode is None or bestRuleCount < bestNodeCount ):
+            return [ zip( bestRule, possVal ) for possVal in self.solveDic[ bestRule ].tolist() ]
+        
+        return [ [ ( bestNode, val ) ] for val in listFromMask( self.possDic[ bestNode ] ) ]
+    
+    
+    def applyChoice( self, choice ):
+        """
+        Given a list of ( node, value ) pairs, fix each node to its value
+        """
+        self.branches += 1
+        for ( node, val ) in choice:
+            self.narrowNode( node, 1 << val )
+    
+    
+    def saveState( self ):
+        """
+        Return a snapshot of the solve state which restoreState can roll
+        back to.  The solveDic arrays are only ever replaced, never
+        modified, so shallow copies are enough.  Snapshots are only
+        taken once propagation has finished, so the work lists are empty
+        """
+        return ( dict( self.possDic ), dict( self.solveDic ), list( self.ruleList ) )
+    
+    
+    def restoreState( self, state ):
+        """
+        Roll back to a snapshot taken by saveState
+        """
+        possDic, solveDic, ruleList = state
+        self.possDic = dict( possDic )
+        self.solveDic = dict( solveDic )
+        self.ruleList = list( ruleList )
+        self.ruleDic = dict( ( tuple( rule[0] ), rule ) for rule in self.ruleList )
         
-        self.k.updateSolveDic( self.solveDic )
-        self.k.updatePossDic( self.possDic )
+        self.ruleQueue.clear()
+        self.lineQueue.clear()
+        self.queued.clear()
+        self.contradicted = False
+        self.kenkenSolved()
         
-        print '\n\n\t\tSOLVED!'
+        if self.stats is not None:
+            self.stats.resetTupleCount( self.solveDic )
+
+    
+    def validSolution( self ):
+        """
+        Check that a fully solved possDic actually satisfies every row,
+        column, and rule of the kenken
+        """
+        N = self.size
+        boardMask = fullMask( N )
+        for i in range( N ):
+            rowMask, colMask = 0, 0
+            for j in range( N ):
+                if not ( isSingleton( self.possDic[ j, i ] ) and isSingleton( self.possDic[ i, j ] ) ):
+                    return False
+                rowMask |= self.possDic[ j, i ]
+                colMask |= self.possDic[ i, j ]
+            if rowMask != boardMask or colMask != boardMask:
+                return False
+        
+        for ( nodeList, operation, value ) in self.k.ruleList:
+            vals = [ listFromMask( self.possDic[ node ] )[0] for node in nodeList ]
+            if not ruleSatisfied( operation, value, vals ):
+                return False
+        
+        return True
         
     
     def cleanSingles( self ):
@@ -102,9 +707,10 @@ class KenKenSolver():
         for rule in equalsRules:
             self.ruleList.remove( rule )
             nodeList, e, val = rule
+            self.ruleDic.pop( tuple( nodeList ), None )
             node = nodeList[0]
             self.setNodeEqual( node, val )
-            self.solveDic[ tuple(nodeList) ] = [ (val,) ]
+            self.updateSolveDic( tuple(nodeList), tupleArray( [ (val,) ], 1 ) )
         
         if self.showOnFly == True:
             self.updateAndDisplay()
@@ -112,131 +718,58 @@ class KenKenSolver():
     
     def pareValues( self ):
         """
-        Take a given rule and establish which values are even possible
+        Take every rule and establish which values are even possible
         in the squares associated with that rule
         """
         for rule in self.ruleList:
-            nodeList, operation, value = rule
-            l = len( nodeList )
-            
-            #   Figure out what the possible combinations of numbers are
-            #   that will satisfy the rule in the first place
-            solveSet = [ [ possValOrder for possValOrder in itertools.permutations( possVals )      \
-                           if self.possValOrderFits( nodeList, possValOrder ) ]                     \
-                           for possVals in self.possibleValuesForOperation( operation, value, l )   ]
-           
-            #   Flatten and remove duplicates
-            tempSolveSet = [ ]
-            
-            for el in solveSet:
-                tempSolveSet += el
-            solveSet = list( tempSolveSet )
-            
-            solveSet = removeDuplicates( solveSet )
-            
-            del( tempSolveSet )
-            
-            #   Update solveDic and possDic
-            self.updateSolveAndPoss( solveSet, nodeList )
+            self.pareRule( rule )
         
         if self.showOnFly == True:
             self.updateAndDisplay()
-
-
-    def possibleValuesForOperation( self, operation, value, l ):
-        """
-        Return a generator object which will cycle through the allowed
-        possible values of l object
-        """
-        if operation == EQUALS:
-            raise ValueError, "Equals rule that wasn't removed"
-            
-        elif operation == PLUS:
-            x = itertools.combinations_with_replacement( range( 1, self.size + 1 ), l )
-            return ( el for el in x if ( scipy.sum( el ) == value ) )
-            
-        elif operation == TIMES:
-            x = itertools.combinations_with_replacement( range( 1, self.size + 1 ), l )
-            return ( el for el in x if ( scipy.product( el ) == value ) )
-            
-        elif operation == MINUS:
-            x = itertools.combinations( range( 1, self.size + 1 ), 2 )
-            return ( el for el in x if el[1] - el[0] == value )
-            
-        else:#operation == DIVIDE:
-            x = itertools.combinations( range( 1, self.size + 1 ), 2 )
-            return ( el for el in x if float(el[1]) / el[0] == value )
     
     
-    def possValOrderFits( self, nodeList, possValOrder ):
+    def pareRule( self, rule ):
         """
-        Given a list of nodes and a specific order for those values,
-        determine whether or not those values can go in those nodes
+        Take a given rule and establish which values are even possible
+        in the squares associated with that rule
         """
+        nodeList, operation, value = rule
+        l = len( nodeList )
         
-        #   Restrict the allowed values in a given set of nodes
-        #   to combinations which are subsests of these allowed
-        #   values AND valid given the state of the solve
-        #   dictionary (i.e avoid overlaps in the possible 
-        #   solution itself, contain only numbers already 
-        #   present in the solveDic for the given nodes, and 
-        #   don't use any of the solved values, etc.)
+        #   Every ordering of the values that satisfy the rule in the
+        #   first place, one row per ordering
+        orderings = CC.orderingArray( operation, value, l, self.size, self.checkDeadline )
+        self.checkDeadline()
         
-        for i in range( len( nodeList ) ):
-            node = nodeList[ i ]
-            possVal = possValOrder[ i ]
-            a, b = node
-            
-            #   Check that this value hasn't already been ruled out
-            if possVal not in self.possDic[ node ]:
-                return False
-            
-            #   Check that this value isn't in that row or column
-            for j in range( self.size ):
-                if ( j != b and self.possDic[ a, j ] == [ possVal ] ) or ( j != a and self.possDic[ j, b ] == [ possVal ] ):
-                    return False
-            
-        #   Check that the suggested arangement of these values 
-        #   isn't a problem itself
-        invertDic = {}
-        for (i,val) in enumerate( possValOrder ):
-            node = nodeList[ i ]
-            if val not in invertDic:
-                invertDic[ val ] = []
-            invertDic[ val ].append( node )
-        
-        for val, nodesWithVal in invertDic.iteritems():
-            if len( nodesWithVal ) != 1:
-                #   If there are any repetitions among the x or y
-                #   component of the nodes inside, reject the values
-                for ( node1, node2 ) in itertools.combinations( nodesWithVal, 2 ):
-                    if node1[0] == node2[0] or node1[1] == node2[1]:
-                        return False
-        
-        del( invertDic )
+        #   Keep the orderings whose values are all still allowed and
+        #   not solved elsewhere in their rows and columns, a column of
+        #   orderings at a time
+        allowed = numpy.array( [ self.possDic[ node ] & ~self.solvedPeerMask( node ) for node in nodeList ] )
+        fits = ( ( allowed >> orderings ) & 1 ).all( axis = 1 )
         
-        return True
+        #   ... and which don't repeat a value in a row or column
+        for ( a, b ) in linePairs( nodeList ):
+            fits &= orderings[ :, a ] != orderings[ :, b ]
+        
+        #   Update solveDic and possDic
+        self.updateSolveAndPoss( orderings[ fits ], nodeList )
+
 
-    
     def updateSolveAndPoss( self, solveSet, nodeList ):
         """
         Combine the process of declaring all of the solutions allowed
-        for a set of nodes and paring the possVals list in the process
+        for a set of nodes (an array of tuples, see tupleArray) and
+        paring the possVals masks in the process
         """
-        l = len( nodeList )
-        self.solveDic[ tuple( nodeList ) ] = solveSet
+        self.updateSolveDic( tuple( nodeList ), solveSet )
         
         #   Update possDic
-        #   Reduce the lists into the acceptable values in each of
-        #   the node slots
-        for i in range( l ):
-            z = sorted( [ x[ i ] for x in solveSet ] )
-            
-            z = removeDuplicates( z )
-        
-            #   Update the solveDic
-            self.possDic[ nodeList[ i ] ] = z
-    
+        #   Reduce the tuples into the acceptable values in each of
+        #   the node slots (never re-allowing a value which has been
+        #   ruled out by some other means)
+        for ( node, mask ) in zip( nodeList, projectMasks( solveSet ) ):
+            self.narrowNode( node, mask )
+
     
     #def singleValueInRules( self ):
     #    """
@@ -279,12 +812,12 @@ class KenKenSolver():
             #   Find all i-length subsets of nodes
             for nodeSet in itertools.combinations( nodeList, i ):
                 #   Collect the total allowed values
-                allowedVals = self.allowedValueSet( nodeSet )
-                if len( allowedVals ) == i:
+                allowedMask = self.allowedValueMask( nodeSet )
+                if popCount( allowedMask ) == i:
                     #   Collect the nodes from which we are removing
                     #   values, the remove those values
                     dropNodes = [ node for node in nodeList if node not in nodeSet ]
-                    self.dropValsFromNodesRule( allowedVals, dropNodes, tuple(nodeList) )
+                    self.dropValsFromNodesRule( listFromMask( allowedMask ), dropNodes, tuple(nodeList) )
         
         if self.showOnFly == True:
             self.updateAndDisplay()
@@ -292,65 +825,117 @@ class KenKenSolver():
     
     def reduceRow( self, rowIndex ):
         """
-        Cycle through all combinations of unsolved nodes in a given
-        row.  If there is any subset of N of those M nodes for which
-        there are only N allowed values, remove those N values from the
-        other M - N nodes
+        Look for subsets of the unsolved nodes in a given row which pin
+        down some values (see reduceLine)
         """
-        rowNodeList = [ ( i, rowIndex ) for i in range(0, self.size) ]
-        l = self.size
-        
-        for i in range( 2, l ):
-            #   Find all i-length subsets of nodes in this row
-            for rowNodeSubSet in itertools.combinations( rowNodeList, i ):
-                #   Collect the total allowed values
-                allowedVals = self.allowedValueSet( rowNodeSubSet )
-                if len( allowedVals ) == i:
-                    #   Collect the nodes from which we are removing
-                    #   values, the remove those values
-                    dropNodes = [ node for node in rowNodeList if node not in rowNodeSubSet ]
-                    self.dropValsFromNodesRow( allowedVals, dropNodes )
-        
-        if self.showOnFly == True:
-            self.updateAndDisplay()
+        self.reduceLine( [ ( i, rowIndex ) for i in range( self.size ) ] )
     
     
     def reduceColumn( self, columnIndex ):
         """
-        Cycle through all combinations of unsolved nodes in a given
-        column.  If there is any subset of N of those M nodes for which
-        there are only N allowed values, remove those N values from the
-        other M - N nodes
+        Look for subsets of the unsolved nodes in a given column which
+        pin down some values (see reduceLine)
+        """
+        self.reduceLine( [ ( columnIndex, i ) for i in range( self.size ) ] )
+    
+    
+    def reduceLine( self, lineNodeList ):
         """
-        colNodeList = [ ( columnIndex, i ) for i in range( self.size) ]
-        l = self.size
+        Given the nodes of a row or column:
         
-        for i in range( 2, l ):
-            #   Find all i-length subsets of nodes in this row
-            for colNodeSubSet in itertools.combinations( colNodeList, i ):
-                #   Collect the total allowed values
-                allowedVals = self.allowedValueSet( colNodeSubSet )
-                if len( allowedVals ) == i:
-                    #   Collect the nodes from which we are removing
-                    #   values, the remove those values
-                    dropNodes = [ node for node in colNodeList if node not in colNodeSubSet ]
-                    self.dropValsFromNodesRow( allowedVals, dropNodes )
+            singles:        a solved node's value can be dropped from
+                            every other node in the line
+            naked subsets:  if some M unsolved nodes allow only M values
+                            between them, drop those values from the
+                            other unsolved nodes
+            hidden subsets: if some M values are only allowed in M of
+                            the unsolved nodes, drop every other value
+                            from those nodes (M = 1 is a hidden single)
         
-        if self.showOnFly == True:
-            self.updateAndDisplay()
+        Subsets are grown one node (or value) at a time and abandoned as
+        soon as they cover more than maxSubsetSize values (or nodes), so
+        we never visit every combination.  A naked subset of M nodes is
+        the same thing as a hidden subset of the other unsolved nodes,
+        so by default M only needs to run up to half of them
+        """
+        solvedMask = 0
+        unsolved = []
+        for node in lineNodeList:
+            mask = self.possDic[ node ]
+            if isSingleton( mask ):
+                solvedMask |= mask
+            else:
+                unsolved.append( node )
+        
+        #   Singles
+        for node in unsolved:
+            self.narrowNode( node, ~solvedMask )
+        
+        #   Nodes that singles just solved are placed too, or the hidden
+        #   subsets below would put their values somewhere else as well
+        stillUnsolved = []
+        for node in unsolved:
+            mask = self.possDic[ node ]
+            if isSingleton( mask ):
+                solvedMask |= mask
+            else:
+                stillUnsolved.append( node )
+        unsolved = stillUnsolved
+        n = len( unsolved )
+        if n < 2:
+            return
+        
+        if self.maxSubsetSize is None:
+            maxSize = n / 2
+        else:
+            maxSize = min( self.maxSubsetSize, n - 1 )
+        
+        #   Without SUB_GROUPS only hidden singles are looked for
+        if SUB_GROUPS not in self.techniques:
+            maxSize = 1
+        
+        #   Naked subsets, from the allowed values of each node
+        masks = [ self.possDic[ node ] for node in unsolved ]
+        for ( members, valueMask ) in coveringSubsets( masks, 2, maxSize ):
+            for ( a, node ) in enumerate( unsolved ):
+                if not members & ( 1 << a ):
+                    self.narrowNode( node, ~valueMask )
+        
+        #   Hidden subsets, from the positions of each value.  A value
+        #   with no position left can't be placed in this line at all
+        masks = [ self.possDic[ node ] for node in unsolved ]
+        values = listFromMask( fullMask( self.size ) & ~solvedMask )
+        positionMasks = []
+        for val in values:
+            positionMask = 0
+            for ( a, mask ) in enumerate( masks ):
+                if mask & ( 1 << val ):
+                    positionMask |= 1 << a
+            if positionMask == 0:
+                self.contradicted = True
+                return
+            positionMasks.append( positionMask )
+        
+        for ( members, positionMask ) in coveringSubsets( positionMasks, 1, maxSize ):
+            valueMask = 0
+            for ( b, val ) in enumerate( values ):
+                if members & ( 1 << b ):
+                    valueMask |= 1 << val
+            for ( a, node ) in enumerate( unsolved ):
+                if positionMask & ( 1 << a ):
+                    self.narrowNode( node, valueMask )
     
     
-    def allowedValueSet( self, nodeSet ):
+    def allowedValueMask( self, nodeSet ):
         """
-        Given a set of nodes, make a list of all the values in those
-        lists
+        Given a set of nodes, make a mask of all the values allowed in
+        any of those nodes
         """
-        allowedValList = []
+        allowedMask = 0
         for node in nodeSet:
-            allowedValList += self.possDic[ node ]
+            allowedMask |= self.possDic[ node ]
         
-        #   drop duplicates
-        return removeDuplicates( allowedValList )
+        return allowedMask
     
     
     def dropValsFromNodesRule( self, dropVals, dropNodes, nodeList ):
@@ -359,12 +944,16 @@ class KenKenSolver():
         perform the simple task of dropping those values from possDic,
         but also drop all rules which have that value at those nodes
         """
-        for val, node in itertools.product( dropVals, dropNodes ):
+        for node in dropNodes:
             #   Get the new solveSet
-            nodeIndex = nodeList.index[ node ]
-            solveSet = [ solution for solution in self.solveDic[ nodeList ] if solution[ nodeIndex ] != val ]
-            updateSolveAndPoss( self, solveSet, nodeList )
-    
+            nodeIndex = self.positionDic[ node ]
+            oldSolveSet = self.solveDic[ nodeList ]
+            keep = numpy.ones( len( oldSolveSet ), dtype = bool )
+            for val in dropVals:
+                keep &= oldSolveSet[ :, nodeIndex ] != val
+            solveSet = oldSolveSet[ keep ]
+            self.updateSolveAndPoss( solveSet, nodeList )
+
     
     def dropValsFromNodesRow( self, dropVals, dropNodes ):
         """
@@ -372,16 +961,19 @@ class KenKenSolver():
         from, go node to node and update the rules containing those
         nodes.  This may be redundant, so be it.
         """
-        for val, node in itertools.product( dropVals, dropNodes ):
+        for node in dropNodes:
             #   Get the rule that this node is in, and find all the
-            #   solutions which don't contain the value at that node
-            for nodeList in self.solveDic.keys():
-                if node in nodeList:
-                    nodeIndex = nodeList.index( node )
-                    solveSet = [ solution for solution in self.solveDic[ nodeList ] if solution[nodeIndex] != val ]
-                    self.updateSolveAndPoss( solveSet, nodeList )
-                    break
-    
+            #   solutions which don't contain the values at that node
+            nodeList = self.cageDic[ node ]
+            nodeIndex = self.positionDic[ node ]
+            oldSolveSet = self.solveDic[ nodeList ]
+            keep = numpy.ones( len( oldSolveSet ), dtype = bool )
+            for val in dropVals:
+                keep &= oldSolveSet[ :, nodeIndex ] != val
+            solveSet = oldSolveSet[ keep ]
+            if len( solveSet ) != len( oldSolveSet ):
+                self.updateSolveAndPoss( solveSet, nodeList )
+
     
     '''
     def necessaryRuleValues( self ):
@@ -423,7 +1015,7 @@ class KenKenSolver():
             #   Only proceed if this rule hasn't been solved
             goOn = False
             for node in nodeSet:
-                if len( self.possDic[ node ] ) != 1:
+                if not isSingleton( self.possDic[ node ] ):
                     goOn = True
                     break
             
@@ -504,10 +1096,12 @@ class KenKenSolver():
         
         for (nodeSet, possValList) in self.solveDic.iteritems():
             
+            self.checkDeadline()
+            
             #   Only proceed if this rule hasn't been solved
             goOn = False
             for node in nodeSet:
-                if len( self.possDic[ node ] ) != 1:
+                if not isSingleton( self.possDic[ node ] ):
                     goOn = True
                     break
             
@@ -515,6 +1109,7 @@ class KenKenSolver():
             columnDic = {}
             
             if goOn:
+                possValList = possValList.tolist()
                 for (i,possVal) in enumerate( possValList ):
                     #   Update for these values
                     for (j, val) in enumerate( possVal ):
@@ -580,6 +1175,7 @@ class KenKenSolver():
                     #   Find the minimum overlap among the combinations
                     #   of coordinate kets
                     for indexSetGroup in itertools.combinations( coordKeys, j ):
+                        self.checkDeadline()
                         coordSet = reduceIndices( indexSetGroup )
                             
                         #   We have M indices covered by M index
@@ -602,12 +1198,7 @@ class KenKenSolver():
                                     else:
                                         node = (coord, k)
                                     
-                                    isDropNode = True
-                                    for ruleNodeSet in ruleList:
-                                        if node in ruleNodeSet:
-                                            isDropNode = False
-                                    
-                                    if isDropNode:
+                                    if self.cageDic[ node ] not in ruleList:
                                         dropNodes.append( node )
                                 
                                 dropVals = [ intVal ]
@@ -618,8 +1209,8 @@ class KenKenSolver():
         """
         Update the copyK dictionary, then display it.
         """
-        self.copyK.updateSolveDic( self.solveDic )
-        self.copyK.updatePossDic( self.possDic )
+        self.copyK.updateSolveDic( self.solveDicAsLists() )
+        self.copyK.updatePossDic( self.possDicAsLists() )
         self.displayK.drawKenKen( self.copyK )
         raw_input( "Press [Enter] to continue" )
 
@@ -629,8 +1220,8 @@ class KenKenSolver():
         Check to see if the kenken has been solved
         """
         def check():
-            for ( node, solveList ) in self.possDic.iteritems():
-                if len( solveList ) != 1:
+            for ( node, mask ) in self.possDic.iteritems():
+                if not isSingleton( mask ):
                     return False
             
             return True
@@ -638,6 +1229,20 @@ class KenKenSolver():
         self.solved = check()
     
     
+    def grid( self ):
+        """
+        Return an N x N array of the solved values (0 where a node isn't
+        solved yet)
+        """
+        N = self.size
+        grid = scipy.zeros( ( N, N ), dtype = int )
+        for ( node, mask ) in self.possDic.iteritems():
+            if isSingleton( mask ):
+                grid[ node ] = listFromMask( mask )[0]
+        
+        return grid
+    
+    
     #   Utility routines  ----------------------------------------------
     def setNodeEqual( self, node, val ):
         """
@@ -645,32 +1250,238 @@ class KenKenSolver():
         of the rows and columns
         """
         i, j = node
-        self.possDic[ node ] = [ val ]
+        bit = 1 << val
+        self.narrowNode( node, bit )
         
-        for a in range( 9 ):
+        for a in range( self.size ):
             if a != j:
-                try:
-                    self.possDic[ i, a ].remove( val )
-                except:
-                    pass
+                self.narrowNode( ( i, a ), ~bit )
             if a != i:
-                try:
-                    self.possDic[ a, j ].remove( val )
-                except:
-                    pass
+                self.narrowNode( ( a, j ), ~bit )
+    
+    
+    def updateSolveDic( self, nodeList, solveSet ):
+        """
+        Replace the allowed tuples of a rule (keeping count of them if
+        we are instrumenting)
+        """
+        if self.stats is not None:
+            self.stats.changeTupleCount( len( solveSet ) - len( self.solveDic.get( nodeList, () ) ) )
+        
+        self.solveDic[ nodeList ] = solveSet
+    
+    
+    def narrowNode( self, node, mask ):
+        """
+        Restrict the allowed values of node to those in mask.  If that
+        changes anything, queue up the rules, rows, and columns which
+        need another look
+        """
+        oldMask = self.possDic[ node ]
+        newMask = oldMask & mask
+        
+        if newMask != oldMask:
+            self.possDic[ node ] = newMask
+            self.eliminations[ self.technique ] += popCount( oldMask & ~newMask )
+            if newMask == 0:
+                self.contradicted = True
+            self.queueNode( node, isSingleton( newMask ) )
+    
+    
+    def solvedPeerMask( self, node ):
+        """
+        Return a mask of the values which are already solved in the row
+        or column of node (not counting node itself)
+        """
+        a, b = node
+        peerMask = 0
+        for j in range( self.size ):
+            if j != b:
+                mask = self.possDic[ a, j ]
+                if isSingleton( mask ):
+                    peerMask |= mask
+            if j != a:
+                mask = self.possDic[ j, b ]
+                if isSingleton( mask ):
+                    peerMask |= mask
+        
+        return peerMask
+    
+    
+    def possDicToMasks( self, possDic ):
+        """
+        Given a dictionary of node : possible value lists (as kept by
+        the kenken object), build the node : bitmask dictionary the
+        solver works with, restricted to the N x N board
+        """
+        N = self.size
+        boardMask = fullMask( N )
+        return dict( ( (i,j), maskFromList( possDic[ i, j ] ) & boardMask ) \
+                     for i in range( N ) for j in range( N ) )
+    
+    
+    def possDicAsLists( self ):
+        """
+        Return the solver's possDic as node : sorted value list pairs
+        (the format the kenken object and display expect)
+        """
+        return dict( ( node, listFromMask( mask ) ) for (node, mask) in self.possDic.iteritems() )
+
+
+    def solveDicAsLists( self ):
+        """
+        Return the solver's solveDic as nodeList : sorted tuple list
+        pairs (the format the kenken object expects; the solver keeps
+        tuple arrays)
+        """
+        return dict( ( nodeList, sorted( map( tuple, solveSet.tolist() ) ) ) \
+                     for (nodeList, solveSet) in self.solveDic.iteritems() )
+
+
+#   Propagation units  -------------------------------------------------
+RULE, ROW, COLUMN = 0, 1, 2
 
 
-def removeDuplicates( z ):
+#   Bitmask domains  ---------------------------------------------------
+#
+#   The possible values of a node are kept as an integer with bit v set
+#   if the value v is still allowed (bit 0 is never used), e.g.
+#
+#       [ 1, 3, 4 ]  <-->  0b11010
+#
+def fullMask( N ):
     """
-    Given a possibly unsorted list z, remove duplicate values and return
-    the pared down list
+    The mask allowing every value 1 - N
     """
-    z = sorted( z )
-    j = 0
-    while j < len( z ) - 1:
-        if z[ j ] == z[ j + 1 ]:
-            z.pop( j + 1 )
-        else:
-            j += 1
+    return ( ( 1 << N ) - 1 ) << 1
+
+
+def maskFromList( vals ):
+    """
+    Given an iterable of integer values, return the matching mask
+    """
+    mask = 0
+    for val in vals:
+        mask |= 1 << val
+    
+    return mask
+
+
+def listFromMask( mask ):
+    """
+    Given a mask, return the sorted list of values it allows
+    """
+    vals = []
+    val = 1
+    mask >>= 1
+    while mask:
+        if mask & 1:
+            vals.append( val )
+        mask >>= 1
+        val += 1
+    
+    return vals
+
+
+def popCount( mask ):
+    """
+    The number of values allowed by mask
+    """
+    return bin( mask ).count( '1' )
+
+
+def isSingleton( mask ):
+    """
+    Does mask allow exactly one value?
+    """
+    return mask != 0 and ( mask & ( mask - 1 ) ) == 0
+
+
+def coveringSubsets( masks, minSize, maxSize ):
+    """
+    Given a list of masks, yield ( members, union ) for every subset of
+    between minSize and maxSize of them whose union has exactly as many
+    bits set as the subset has members.  members has bit a set for each
+    masks[ a ] in the subset.  Subsets whose union is already too big are
+    never extended
+    """
+    counts = [ popCount( mask ) for mask in masks ]
+    order = [ a for a in sorted( range( len( masks ) ), key = lambda a : counts[ a ] ) \
+              if counts[ a ] <= maxSize ]
+    
+    stack = [ ( 0, 0, 0, 0 ) ]
+    while stack:
+        start, members, union, size = stack.pop()
+        for b in range( start, len( order ) ):
+            a = order[ b ]
+            newUnion = union | masks[ a ]
+            newCount = popCount( newUnion )
+            if newCount > maxSize:
+                continue
+            newMembers = members | ( 1 << a )
+            if newCount == size + 1 and size + 1 >= minSize:
+                yield ( newMembers, newUnion )
+            elif size + 1 < maxSize:
+                stack.append( ( b + 1, newMembers, newUnion, size + 1 ) )
+
+
+#   Cage tuples  -------------------------------------------------------
+#
+#   The allowed tuples of a rule are kept in solveDic as an array with
+#   one row per tuple and one column per node of the rule, e.g.
+#
+#       [ (1, 4), (4, 1), (2, 3) ]  <-->  [ [ 1, 4 ],
+#                                           [ 4, 1 ],
+#                                           [ 2, 3 ] ]
+#
+#   so they are filtered with boolean masks rather than rebuilt a tuple
+#   at a time
+#
+def tupleArray( tuples, l ):
+    """
+    Given a sequence of tuples of length l (or such an array already),
+    return them as a tuples x l array of small ints
+    """
+    return numpy.array( tuples, dtype = CC.TUPLE_TYPE ).reshape( -1, l )
+
+
+def projectMasks( solveSet ):
+    """
+    Given an array of tuples, return a list with the mask of the values
+    used at each position (0 everywhere if there are no tuples):  each
+    value v becomes the bit 1 << v, and the bits of every column are
+    or-ed together at once
+    """
+    bits = numpy.left_shift( 1, solveSet, dtype = numpy.int64 )
+    return numpy.bitwise_or.reduce( bits, axis = 0 ).tolist()
+
+
+def linePairs( nodeList ):
+    """
+    The pairs of positions ( a, b ), a < b, of the nodes in nodeList
+    which share a row or column, and so can't share a value
+    """
+    return [ ( a, b ) for ( a, b ) in itertools.combinations( range( len( nodeList ) ), 2 ) \
+             if nodeList[ a ][0] == nodeList[ b ][0] or nodeList[ a ][1] == nodeList[ b ][1] ]
+
+
+def ruleSatisfied( operation, value, vals ):
+    """
+    Do the values vals (in any order) satisfy the rule operation, value?
+    """
+    vals = sorted( vals )
+    
+    if operation == EQUALS:
+        return vals == [ value ]
+    
+    elif operation == PLUS:
+        return sum( vals ) == value
+    
+    elif operation == TIMES:
+        return reduce( lambda x, y : x * y, vals, 1 ) == value
+    
+    elif operation == MINUS:
+        return len( vals ) == 2 and vals[1] - vals[0] == value
     
-    return z
+    else:#operation == DIVIDE:
+        return len( vals ) == 2 and vals[1] == value * vals[0]
@@ -0,0 +1,55 @@
+########################################################################
+#                                                                      #
+#   TestEncodeKenKen.py                                                #
+#       Created: Feb 18, 2013                                          #
+#                                                                      #
+#       Tests for the fixed width puzzle records                       #
+#       (python -m unittest TestEncodeKenKen)                          #
+#                                                                      #
+########################################################################
+
+import unittest
+
+import numpy
+
+import CreateKenKen as CK
+import EncodeKenKen as E
+import KenKenClass as K
+
+
+def sortedRules( ruleList ):
+    return sorted( ( sorted( tuple( node ) for node in nodeList ), int( operation ), int( target ) ) \
+                   for ( nodeList, operation, target ) in ruleList )
+
+
+class EncodeTest( unittest.TestCase ):
+
+    def testSplitUniquePuzzleFits( self ):
+        """
+        uniqueKenKen splits single cages out of the plain cage list, so
+        a unique puzzle can have more cages than any plain one; the
+        default layout still holds it
+        """
+        record = CK.createPuzzle( 4, 119, seed = 1, unique = True )
+        self.assertTrue( len( record[ 'cages' ] ) > 4 * 4 / 2 + 4 )
+
+        records = E.encodePuzzles( [ record ], 4 )
+        ( ruleList, solution ), = E.decodeRules( records )
+
+        self.assertEqual( sortedRules( ruleList ), sortedRules( E.puzzleRules( record )[0] ) )
+        self.assertTrue( ( solution == numpy.array( record[ 'solution' ] ) ).all() )
+
+
+    def testTargetLimit( self ):
+        """
+        The product of nine 9s is the biggest target kept; past
+        TARGET_MASK packRules gives up
+        """
+        operations, targets = E.unpackRules( E.packRules( [ K.TIMES ], [ 9**9 ] ) )
+        self.assertEqual( ( operations[0], targets[0] ), ( K.TIMES, 9**9 ) )
+
+        self.assertRaises( ValueError, E.packRules, [ K.TIMES ], [ E.TARGET_MASK + 1 ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+########################################################################
+#                                                                      #
+#   TestExactCoverKenKen.py                                            #
+#       Created: Feb 18, 2013                                          #
+#                                                                      #
+#       Tests for the dancing links solver                             #
+#       (python -m unittest TestExactCoverKenKen)                      #
+#                                                                      #
+########################################################################
+
+import random
+import unittest
+
+import ExactCoverKenKen as XKK
+import KenKenClass as K
+import SolveKenKen as SKK
+
+
+class StoppingSolver( XKK.ExactCoverSolver ):
+    """
+    An ExactCoverSolver which times out after a set number of search
+    steps, for as long as stopAfter is not None
+    """
+
+    stopAfter = None
+
+    def checkDeadline( self ):
+        if self.stopAfter is not None and self.iterations > self.stopAfter:
+            raise SKK.SolveTimeout
+
+
+class TimeoutTest( unittest.TestCase ):
+
+    def testSearchAgainAfterTimeout( self ):
+        """
+        A search cut off deep in the recursion leaves the links as they
+        were, so searching again finds what a fresh solver finds
+        """
+        k = K.KenKen( 6, rng = random.Random( 6 ) )
+        expected = XKK.findSolutions( k, 2 )
+
+        solver = StoppingSolver( k )
+        solver.stopAfter = 5
+        self.assertEqual( solver.solve().status, SKK.TIMEOUT )
+        self.assertEqual( solver.chosen, [] )
+
+        solver.stopAfter = None
+        solutions = solver.findSolutions( 2 )
+        self.assertEqual( [ grid.tolist() for grid in solutions ], [ grid.tolist() for grid in expected ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
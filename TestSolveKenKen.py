@@ -0,0 +1,118 @@
+########################################################################
+#                                                                      #
+#   TestSolveKenKen.py                                                 #
+#       Created: Jan 30, 2013                                          #
+#                                                                      #
+#       Tests for the ken ken solver and the hints built on it         #
+#       (python -m unittest TestSolveKenKen)                           #
+#                                                                      #
+########################################################################
+
+import unittest
+
+import numpy
+
+import KenKenClass as K
+import HintKenKen as HKK
+import PlayKenKen as PKK
+import SolveKenKen as SKK
+from SolveKenKen import maskFromList, listFromMask, isSingleton
+
+
+class ReduceLineTest( unittest.TestCase ):
+
+    def lineSolver( self, lineValues ):
+        """
+        A solver for a 4 x 4 kenken whose first row allows lineValues
+        """
+        solver = SKK.KenKenSolver( K.KenKen( 4 ) )
+        for ( i, vals ) in enumerate( lineValues ):
+            solver.possDic[ i, 0 ] = maskFromList( vals )
+
+        return solver
+
+
+    def testNewlySolvedValueIsNotPlacedTwice( self ):
+        """
+        Singles pins (1,0) to 2; hidden singles must not then put 2 in
+        (2,0) as well
+        """
+        solver = self.lineSolver( [ [1], [1,2], [2,3,4], [3,4] ] )
+        lineNodes = [ ( i, 0 ) for i in range( 4 ) ]
+        solver.reduceLine( lineNodes )
+
+        self.assertFalse( solver.contradicted )
+        self.assertEqual( [ listFromMask( solver.possDic[ node ] ) for node in lineNodes[ :2 ] ], [ [1], [2] ] )
+
+        solvedVals = [ solver.possDic[ node ] for node in lineNodes if isSingleton( solver.possDic[ node ] ) ]
+        self.assertEqual( len( solvedVals ), len( set( solvedVals ) ) )
+
+        #   Another look finishes the line off
+        solver.reduceLine( lineNodes )
+        self.assertEqual( [ listFromMask( solver.possDic[ node ] ) for node in lineNodes ], [ [1], [2], [3,4], [3,4] ] )
+
+
+class SolveStatusTest( unittest.TestCase ):
+
+    def testFilledGridBreakingACageIsAContradiction( self ):
+        """
+        Singles alone fill in the board without ever checking the 6+
+        cage (the values add up to 5), so propagation stops with every
+        node solved and the result has to say the board is impossible
+        """
+        solution = numpy.array( [ [1,2], [2,1] ] )
+        ruleList = [ ( [ (0,0) ], K.EQUALS, 1 ), ( [ (0,1), (1,0), (1,1) ], K.PLUS, 6 ) ]
+        solver = SKK.KenKenSolver( K.KenKen( 2, solution, ruleList = ruleList ), techniques = [ SKK.CLEAN_SINGLES ] )
+        result = solver.solve()
+
+        self.assertTrue( solver.solved )
+        self.assertEqual( result.status, SKK.CONTRADICTION )
+
+
+class HintTest( unittest.TestCase ):
+
+    def dominoKenKen( self ):
+        """
+        A 4 x 4 kenken of two cell cages, none of which pins a value down
+        on its own, so the first hints are all eliminations
+        """
+        solution = numpy.array( [ [1,2,3,4], [2,1,4,3], [3,4,1,2], [4,3,2,1] ] )
+        ruleList = []
+        for i in range( 4 ):
+            for j in ( 0, 2 ):
+                a, b = solution[ i, j ], solution[ i, j + 1 ]
+                if ( i + j ) % 2 == 0:
+                    ruleList.append( ( [ (i,j), (i,j+1) ], K.PLUS, a + b ) )
+                else:
+                    ruleList.append( ( [ (i,j), (i,j+1) ], K.TIMES, a * b ) )
+
+        return K.KenKen( 4, solution, ruleList = ruleList )
+
+
+    def testSessionHintsMoveOn( self ):
+        """
+        Asking a session for another hint gives the next step, not the
+        same elimination again
+        """
+        session = PKK.PlaySession( self.dominoKenKen() )
+        first = session.hint( timeLimit = 1 )
+        second = session.hint( timeLimit = 1 )
+
+        self.assertEqual( first.placements(), [] )
+        self.assertNotEqual( first.describe(), second.describe() )
+
+
+    def testEntriesStartHintsOver( self ):
+        """
+        After a number is entered, hints start from the new board
+        """
+        k = self.dominoKenKen()
+        session = PKK.PlaySession( k )
+        session.hint( timeLimit = 1 )
+        session.apply( (3,3), 1 )
+
+        self.assertEqual( session.hint( timeLimit = 1 ).describe(), HKK.hint( k, { (3,3) : 1 }, timeLimit = 1 ).describe() )
+
+
+if __name__ == '__main__':
+    unittest.main()